@@ -2,13 +2,19 @@
 Constants that may be shared across bots.
 """
 
-from pytz import timezone
+from datetime import timezone
+from zoneinfo import ZoneInfo
 
-EASTERN_TIMEZONE = timezone('US/Eastern')
-CENTRAL_TIMEZONE = timezone('US/Central')
-MOUNTAIN_TIMEZONE = timezone('US/Mountain')
-PACIFIC_TIMEZONE = timezone('US/Pacific')
-UTC = timezone('UTC')
+import os.path
+
+# Where the bots keep files that need to survive from one run to the next.
+STATE_DIRECTORY = os.path.expanduser('~/.redditbot')
+
+EASTERN_TIMEZONE = ZoneInfo('America/New_York')
+CENTRAL_TIMEZONE = ZoneInfo('America/Chicago')
+MOUNTAIN_TIMEZONE = ZoneInfo('America/Denver')
+PACIFIC_TIMEZONE = ZoneInfo('America/Los_Angeles')
+UTC = timezone.utc
 
 TEAM_SUB_MAP = {
   '76ers': 'sixers',
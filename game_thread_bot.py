@@ -7,20 +7,28 @@ will run once and then terminate. In many cases it will have nothing to do. To
 run this on a continuous basis, try using crontab (see the README.md).
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from constants import CENTRAL_TIMEZONE, EASTERN_TIMEZONE, MOUNTAIN_TIMEZONE
-from constants import PACIFIC_TIMEZONE, TEAM_SUB_MAP, UTC, YAHOO_TEAM_CODES
+from constants import PACIFIC_TIMEZONE, STATE_DIRECTORY, TEAM_SUB_MAP, UTC
+from constants import YAHOO_TEAM_CODES
 from datetime import datetime, timedelta
 from enum import Enum
-from optparse import OptionParser
-from services.nba_service import NbaService
+from services.file_cache import FileCache
+from services.nba_service import NbaService, parse_datetime
+from typing import Callable, NamedTuple, TYPE_CHECKING
 
-import dateutil.parser
+import argparse
+import bisect
 import logging.config
-import praw
+import os.path
 import random
-import sys
 import traceback
 
+# praw is slow to import and most runs have nothing to post, so __main__ only
+# imports it (and logs in) once the bot asks for a reddit instance.
+if TYPE_CHECKING:
+  import praw
+
 GAME_THREAD_PREFIX = '[Game Thread]'
 
 POST_GAME_PREFIX = '[Post Game Thread]'
@@ -36,7 +44,7 @@ DEFEAT_SYNONYMS = [
   'walk all over',
   'exterminate',
   'slaughter',
-  'massacre'
+  'massacre',
   'obliterate',
   'eviscerate',
   'annihilate',
@@ -45,9 +53,38 @@ DEFEAT_SYNONYMS = [
   'hang on to defeat',
 ]
 
+# Groups of DEFEAT_SYNONYMS that fit how close the game was.
+CLOSE_WIN_SYNONYMS = tuple(DEFEAT_SYNONYMS[14:16])
+NARROW_WIN_SYNONYMS = tuple(DEFEAT_SYNONYMS[15:])
+BLOWOUT_WIN_SYNONYMS = tuple(DEFEAT_SYNONYMS[9:14])
+BIG_WIN_SYNONYMS = tuple(DEFEAT_SYNONYMS[3:9])
+WIN_SYNONYMS = tuple(DEFEAT_SYNONYMS[:3])
+LOSS_SYNONYMS = tuple(DEFEAT_SYNONYMS[:2])
+
+# Which synonyms to use when the Knicks win, by margin of victory. A win by less
+# than WIN_MARGINS[0] uses WIN_SYNONYMS_BY_MARGIN[0] and so on.
+WIN_MARGINS = (3, 6, 21, 41)
+WIN_SYNONYMS_BY_MARGIN = (
+  CLOSE_WIN_SYNONYMS,
+  NARROW_WIN_SYNONYMS,
+  WIN_SYNONYMS,
+  BIG_WIN_SYNONYMS,
+  BLOWOUT_WIN_SYNONYMS,
+)
+
 # Will ignore posts older than this many hours
 MAX_POST_AGE_HOURS = 6
 
+# When there's no game coming up, wait at most this many hours before looking at
+# the schedule again (in case a game gets moved).
+MAX_IDLE_HOURS = 1
+
+# How many of the newest posts to look through for an existing bot thread. This
+# covers everyone's posts, not just the bot's, so it has to be big enough for a
+# busy game day. The scan stops early at the first post older than
+# MAX_POST_AGE_HOURS anyway, so a quiet sub never gets close to this.
+MAX_POSTS_TO_SCAN = 300
+
 
 class GameThreadBot:
 
@@ -56,31 +93,93 @@ class GameThreadBot:
       logger: logging.Logger,
       nba_service: NbaService,
       now: datetime,
-      reddit: praw.Reddit,
+      reddit_factory: Callable[[], 'praw.Reddit'],
       subreddit_name: str,
-      num_games_postponed: int = 0):
+      num_games_postponed: int = 0,
+      state: FileCache = None):
+    """
+    Parameters
+    ----------
+    reddit_factory: Callable[[], praw.Reddit]
+      Returns the reddit instance to post with. It's only called once the bot
+      knows it has a thread to create or update.
+    """
     self.logger = logger
     self.nba_service = nba_service
     self.now = now
-    self.reddit = reddit
-    self.subreddit = self.reddit.subreddit(subreddit_name)
+    self.reddit_factory = reddit_factory
+    self.subreddit_name = subreddit_name
     self.num_games_postponed = num_games_postponed
+    self.state = state
+    self._reddit = None
+    self._subreddit = None
+    self._username = None
+
+  @property
+  def reddit(self):
+    if self._reddit is None:
+      self._reddit = self.reddit_factory()
+    return self._reddit
+
+  @property
+  def subreddit(self):
+    if self._subreddit is None:
+      self._subreddit = self.reddit.subreddit(self.subreddit_name)
+    return self._subreddit
 
   def run(self):
+    if self._is_idle():
+      self.logger.info('No game coming up yet. Nothing to do. Goodbye.')
+      return
+
     season_year = self.nba_service.current_year()
     schedule = self.nba_service.schedule('knicks', season_year)
     (action, game) = self._get_current_game(schedule)
 
     if action == Action.DO_NOTHING:
+      self._save_idle_until(schedule)
       self.logger.info('Nothing to do. Goodbye.')
       return
 
-    boxscore = self._get_boxscore(game)
-    teams = self.nba_service.teams(season_year)
+    # The boxscore and team metadata don't depend on each other.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+      boxscore_future = executor.submit(self._get_boxscore, game)
+      teams_future = executor.submit(self.nba_service.teams, season_year)
+      boxscore = boxscore_future.result()
+      teams = teams_future.result()
     title, body = self._build_game_thread_text(boxscore, teams, season_year) \
         if action == Action.DO_GAME_THREAD \
         else self._build_postgame_thread_text(boxscore, teams)
-    self._create_or_update_game_thread(action, title, body)
+    self._create_or_update_game_thread(action, title, body, game['gameId'])
+
+  def _is_idle(self):
+    """Returns true if a previous run already decided there's nothing to do
+    until some time after now, so we don't need to look at the schedule."""
+    if self.state is None:
+      return False
+    idle_until = self.state.get('idle_until')
+    return idle_until is not None and self.now < parse_datetime(idle_until)
+
+  def _save_idle_until(self, schedule):
+    """Remembers how long we can go without checking the schedule. That's until
+    an hour before the next tip-off, but not longer than MAX_IDLE_HOURS."""
+    if self.state is None:
+      return
+    last_played_idx = (schedule['league']['lastStandardGamePlayedIndex']
+                       + self.num_games_postponed)
+    games = schedule['league']['standard']
+
+    # Don't go idle while the last game could still get a post game thread.
+    last_gametime = parse_datetime(games[last_played_idx]['startTimeUTC'])
+    if last_gametime + timedelta(hours=MAX_POST_AGE_HOURS) >= self.now:
+      return
+
+    idle_until = self.now + timedelta(hours=MAX_IDLE_HOURS)
+    if len(games) > last_played_idx + 1:
+      gametime = parse_datetime(games[last_played_idx + 1]['startTimeUTC'])
+      idle_until = min(idle_until, gametime - timedelta(hours=1))
+    if idle_until > self.now:
+      self.state.put('idle_until', idle_until.isoformat())
 
   def _get_boxscore(self, game):
     game_start = game['startDateEastern']
@@ -106,7 +205,7 @@ class GameThreadBot:
     # tip-off or later and there's no score, then we want to make a game thread.
     if len(games) > last_played_idx + 1:
       game = games[last_played_idx + 1]
-      gametime = dateutil.parser.parse(game['startTimeUTC'])
+      gametime = parse_datetime(game['startTimeUTC'])
       has_score = bool(game['vTeam']['score']) or bool(game['hTeam']['score'])
       if gametime - timedelta(hours=1) <= self.now and not has_score:
         return Action.DO_GAME_THREAD, game
@@ -114,7 +213,7 @@ class GameThreadBot:
     # If the previous game was finished 6 hours ago or less, then use that to
     # make a post game thread.
     game = games[last_played_idx]
-    gametime = dateutil.parser.parse(game['startTimeUTC'])
+    gametime = parse_datetime(game['startTimeUTC'])
     has_score = bool(game['vTeam']['score'] + game['hTeam']['score'])
     if gametime + timedelta(hours=MAX_POST_AGE_HOURS) >= self.now and has_score:
       return Action.DO_POST_GAME_THREAD, game
@@ -128,10 +227,10 @@ class GameThreadBot:
     This is heavily inspired by https://bit.ly/3hBwfmC.
     """
     basic_game_data = boxscore['basicGameData']
-    hteam = basic_game_data['hTeam']
-    vteam = basic_game_data['vTeam']
+    hteam = self._team_view(teams, basic_game_data['hTeam'])
+    vteam = self._team_view(teams, basic_game_data['vTeam'])
 
-    if hteam['triCode'] == 'NYK':
+    if hteam.tri_code == 'NYK':
       us = 'hTeam'
       them = 'vTeam'
       home_away_sign = 'vs'
@@ -153,17 +252,18 @@ class GameThreadBot:
     knicks_broadcaster = broadcaster_name(us)
     other_broadcaster = broadcaster_name(them)
 
-    knicks_record = f"({basic_game_data[us]['win']}-{basic_game_data[us]['loss']})"
-    other_record = f"({basic_game_data[them]['win']}-{basic_game_data[them]['loss']})"
-    other_subreddit = TEAM_SUB_MAP[teams[basic_game_data[them]['teamId']]['nickname']]
-    other_team_name = teams[basic_game_data[them]['teamId']]['fullName']
-    other_team_nickname = teams[basic_game_data[them]['teamId']]['nickname']
+    knicks, other = (hteam, vteam) if us == 'hTeam' else (vteam, hteam)
+    knicks_record = f'({knicks.win}-{knicks.loss})'
+    other_record = f'({other.win}-{other.loss})'
+    other_team_name = other.full_name
+    other_team_nickname = other.nickname
+    other_subreddit = other.subreddit
     location = self._build_location_string(basic_game_data)
     arena = basic_game_data['arena']['name']
-    start_time_utc = dateutil.parser.parse(basic_game_data['startTimeUTC'])
+    start_time_utc = parse_datetime(basic_game_data['startTimeUTC'])
 
     def time_str(timezone):
-      return start_time_utc.astimezone(timezone).strftime('%I:%M %p')
+      return self._clock_time(start_time_utc.astimezone(timezone))
 
     eastern = time_str(EASTERN_TIMEZONE)
     central = time_str(CENTRAL_TIMEZONE)
@@ -171,53 +271,55 @@ class GameThreadBot:
     pacific = time_str(PACIFIC_TIMEZONE)
 
     urlpart = (
-        f'{vteam["triCode"].lower()}-vs-{hteam["triCode"].lower()}-'
+        f'{vteam.tri_code_slug}-vs-{hteam.tri_code_slug}-'
         f'{basic_game_data["gameId"]}')
     nba_pass_link = f'https://www.nba.com/game/{urlpart}?watch'
     preview_link = f'https://www.nba.com/game/{urlpart}'
     play_link = f'https://www.nba.com/game/{urlpart}/play-by-play'
     box_link = f'https://www.nba.com/game/{urlpart}/box-score#box-score'
 
-    body = '##### General Information\n\n'
-    body += '**TIME**|**BROADCAST**|**Media**|**Location and Subreddit**|\n'
-    body += ':------------|:------------------------------------|:------------------------------------|:-------------------|\n'
-    body += f'{eastern} Eastern   | National Broadcast: {national_broadcaster}           |[Game Preview]({preview_link})| {location}|\n'
-    body += f'{central} Central   | Knicks Broadcast: {knicks_broadcaster}               |[Play By Play]({play_link})| {arena}|\n'
-    body += f'{mountain} Mountain | {other_team_nickname} Broadcast: {other_broadcaster} |[Box Score]({box_link})| r/NYKnicks|\n'
-    body += f'{pacific} Pacific   | [NBA League Pass]({nba_pass_link})                   || r/{other_subreddit}|\n'
+    body = [
+      '##### General Information\n\n',
+      '**TIME**|**BROADCAST**|**Media**|**Location and Subreddit**|\n',
+      ':------------|:------------------------------------|:------------------------------------|:-------------------|\n',
+      f'{eastern} Eastern   | National Broadcast: {national_broadcaster}           |[Game Preview]({preview_link})| {location}|\n',
+      f'{central} Central   | Knicks Broadcast: {knicks_broadcaster}               |[Play By Play]({play_link})| {arena}|\n',
+      f'{mountain} Mountain | {other_team_nickname} Broadcast: {other_broadcaster} |[Box Score]({box_link})| r/NYKnicks|\n',
+      f'{pacific} Pacific   | [NBA League Pass]({nba_pass_link})                   || r/{other_subreddit}|\n',
+    ]
 
     starters_table = self._build_starters_table(boxscore, teams)
     if starters_table is not None:
-      body += '\n##### Starting lineups\n\n'
-      body += starters_table
+      body.append('\n##### Starting lineups\n\n')
+      body.append(starters_table)
 
     inactive_table = self._build_inactive_table(boxscore, teams, year)
     if inactive_table is not None:
-      body += '\n##### Inactive\n\n'
-      body += inactive_table
+      body.append('\n##### Inactive\n\n')
+      body.append(inactive_table)
 
     if basic_game_data['officials']['formatted']:
       officials = ', '.join([o['firstNameLastName']
           for o in basic_game_data['officials']['formatted']])
-      body += '\n##### Officials\n\n'
-      body += '||\n'
-      body += '|:--|\n'
-      body += f'|{officials}|\n'
+      body.append('\n##### Officials\n\n')
+      body.append('||\n')
+      body.append('|:--|\n')
+      body.append(f'|{officials}|\n')
 
     linescore = self._build_linescore(boxscore, teams)
     if linescore is not None:
-      body += '\n##### Score\n\n'
-      body += f'{linescore}\n'
+      body.append('\n##### Score\n\n')
+      body.append(f'{linescore}\n')
 
-    body += '\n-----\n\n'
-    body += '[Reddit Stream](https://reddit-stream.com/comments/auto) '
-    body += '(You must click this link from the comment page.)\n'
+    body.append('\n-----\n\n')
+    body.append('[Reddit Stream](https://reddit-stream.com/comments/auto) ')
+    body.append('(You must click this link from the comment page.)\n')
 
     title = (f'{GAME_THREAD_PREFIX} The New York Knicks {knicks_record} ' +
              f'{home_away_sign} The {other_team_name} {other_record} - ' +
              f'({self.now.astimezone(EASTERN_TIMEZONE).strftime("%B %d, %Y")})')
 
-    return title, body
+    return title, ''.join(body)
 
   @staticmethod
   def _build_location_string(basic_game_data):
@@ -228,29 +330,45 @@ class GameThreadBot:
     return location if country == 'USA' else f'{location} {country}'
 
   def _build_postgame_thread_text(self, boxscore, teams):
-    title = self._build_postgame_title(boxscore, teams)
+    outcome = self._game_outcome(boxscore['basicGameData'], teams)
+    title = self._build_postgame_title(boxscore, teams, outcome)
     body = self._build_boxscore_text(boxscore, teams)
     return title, body
 
-  def _build_postgame_title(self, boxscore, teams):
+  @staticmethod
+  def _game_outcome(basic_game_data, teams):
+    """Works out the final score and whether the Knicks won."""
+    home_score = int(basic_game_data['hTeam']['score'])
+    road_score = int(basic_game_data['vTeam']['score'])
+    knicks_home = (
+        teams[basic_game_data['hTeam']['teamId']]['urlName'] == 'knicks')
+    knicks_won = (home_score > road_score if knicks_home
+                  else road_score > home_score)
+    return GameOutcome(
+        home_score=home_score,
+        road_score=road_score,
+        diff=abs(home_score - road_score),
+        knicks_won=knicks_won)
+
+  def _build_postgame_title(self, boxscore, teams, outcome):
     """Builds a title for the post game thread.
 
     Ported from https://bit.ly/3rOmvdd.
     """
     basic_game_data = boxscore['basicGameData']
-    home_team = basic_game_data["hTeam"]
-    road_team = basic_game_data["vTeam"]
-    defeat = self._build_defeat_synonym(basic_game_data, teams)
+    home_team = self._team_view(teams, basic_game_data["hTeam"])
+    road_team = self._team_view(teams, basic_game_data["vTeam"])
+    defeat = self._build_defeat_synonym(outcome)
 
-    home_team_score = int(home_team["score"])
-    road_team_score = int(road_team["score"])
+    home_team_score = outcome.home_score
+    road_team_score = outcome.road_score
     score = (f'{max(road_team_score, home_team_score)}-'
              f'{min(road_team_score, home_team_score)}')
 
-    home_team_name = teams[home_team["teamId"]]['fullName']
-    home_team_record = f'{home_team["win"]}-{home_team["loss"]}'
-    road_team_name = teams[road_team["teamId"]]['fullName']
-    road_team_record = f'{road_team["win"]}-{road_team["loss"]}'
+    home_team_name = home_team.full_name
+    home_team_record = f'{home_team.win}-{home_team.loss}'
+    road_team_name = road_team.full_name
+    road_team_record = f'{road_team.win}-{road_team.loss}'
     if home_team_score > road_team_score:
       winners = f'{home_team_name} ({home_team_record})'
       losers = f'{road_team_name} ({road_team_record})'
@@ -258,7 +376,7 @@ class GameThreadBot:
       losers = f'{home_team_name} ({home_team_record})'
       winners = f'{road_team_name} ({road_team_record})'
 
-    quarters = len(basic_game_data['vTeam']['linescore'])
+    quarters = len(road_team.linescore)
     maybe_overtime = ''
     if quarters == 5:
       maybe_overtime = ' in OT'
@@ -269,27 +387,15 @@ class GameThreadBot:
     return f'{POST_GAME_PREFIX} {title}'
 
   @staticmethod
-  def _build_defeat_synonym(basic_game_data, teams):
+  def _build_defeat_synonym(outcome):
     """Says 'defeated' in creative and random ways.
 
     Ported from https://bit.ly/3o6QvPB.
     """
-    home_team_name = teams[basic_game_data['hTeam']['teamId']]['urlName']
-    hscore = int(basic_game_data["hTeam"]["score"])
-    vscore = int(basic_game_data["vTeam"]["score"])
-    knicks_win = ((home_team_name == "knicks" and hscore > vscore)
-        or (home_team_name != "knicks" and vscore > hscore))
-    if knicks_win:
-      if abs(hscore - vscore) < 3:
-        return random.choice(DEFEAT_SYNONYMS[14:16])
-      elif abs(hscore - vscore) < 6:
-        return random.choice(DEFEAT_SYNONYMS[15:])
-      elif abs(hscore - vscore) > 40:
-        return random.choice(DEFEAT_SYNONYMS[9:14])
-      elif abs(hscore - vscore) > 20:
-        return random.choice(DEFEAT_SYNONYMS[3:9])
-      return random.choice(DEFEAT_SYNONYMS[:3])
-    return random.choice(DEFEAT_SYNONYMS[:2])
+    if outcome.knicks_won:
+      i = bisect.bisect(WIN_MARGINS, outcome.diff)
+      return random.choice(WIN_SYNONYMS_BY_MARGIN[i])
+    return random.choice(LOSS_SYNONYMS)
 
   def _build_boxscore_text(self, boxscore, teams):
     """Builds up the post game selftext.
@@ -299,27 +405,18 @@ class GameThreadBot:
     basicGameData = boxscore["basicGameData"]
 
     # Header
-    hTeamBasicData = basicGameData["hTeam"]
-    hTeamFullName = teams[hTeamBasicData['teamId']]['fullName']
-    hTeamNickname = teams[hTeamBasicData['teamId']]['nickname']
-    hTeamLogo = TEAM_SUB_MAP[teams[basicGameData['hTeam']['teamId']]['nickname']]
-    hTeamScore = hTeamBasicData["score"]
-    vTeamBasicData = basicGameData["vTeam"]
-    vTeamFullName = teams[vTeamBasicData['teamId']]['fullName']
-    vTeamNickname = teams[vTeamBasicData['teamId']]['nickname']
-    vTeamLogo = TEAM_SUB_MAP[teams[basicGameData['vTeam']['teamId']]['nickname']]
-    vTeamScore = vTeamBasicData["score"]
-    nba_url = (f'https://www.nba.com/game/{vTeamBasicData["triCode"]}-vs-'
-              f'{hTeamBasicData["triCode"]}-{basicGameData["gameId"]}')
+    hTeam = self._team_view(teams, basicGameData["hTeam"])
+    vTeam = self._team_view(teams, basicGameData["vTeam"])
+    nba_url = (f'https://www.nba.com/game/{vTeam.tri_code}-vs-'
+              f'{hTeam.tri_code}-{basicGameData["gameId"]}')
     yahoo_url = ('http://sports.yahoo.com/nba/'
-                f'{vTeamFullName.lower().replace(" ", "-")}-'
-                f'{hTeamFullName.lower().replace(" ", "-")}-'
+                f'{vTeam.full_name_slug}-{hTeam.full_name_slug}-'
                 f'{basicGameData["startDateEastern"]}'
-                f'{YAHOO_TEAM_CODES[hTeamBasicData["triCode"]]}')
-    start_time_est = (dateutil.parser.parse(basicGameData['startTimeUTC'])
+                f'{YAHOO_TEAM_CODES[hTeam.tri_code]}')
+    start_time_est = (parse_datetime(basicGameData['startTimeUTC'])
         .astimezone(EASTERN_TIMEZONE))
     threadalytics_url = (f'https://threadalytics.com/teams/NYK/games/'
-                         f'{hTeamBasicData["triCode"]}@{vTeamBasicData["triCode"]}'
+                         f'{hTeam.tri_code}@{vTeam.tri_code}'
                          f'-{int(start_time_est.timestamp())}')
     arena = basicGameData["arena"]["name"]
     attendance = basicGameData["attendance"]
@@ -331,11 +428,11 @@ class GameThreadBot:
     duration = duration.replace(' and 1 minutes', ' and 1 minute')
 
     # Game summary
-    body = f"""##### Game Summary
+    body = [f"""##### Game Summary
 
 |||
 |:--|:--|
-|**Score**|[{vTeamFullName}](/r/{vTeamLogo}) **{vTeamScore} -  {hTeamScore}** [{hTeamFullName}](/r/{hTeamLogo})|
+|**Score**|[{vTeam.full_name}](/r/{vTeam.subreddit}) **{vTeam.score} -  {hTeam.score}** [{hTeam.full_name}](/r/{hTeam.subreddit})|
 |**Data**|[NBA]({nba_url}), [Yahoo]({yahoo_url}), [Threadalytics]({threadalytics_url})|
 |**Location**|{self._build_location_string(basicGameData)}|
 |**Arena**|{arena}|
@@ -343,105 +440,51 @@ class GameThreadBot:
 |**Start Time**|{(start_time_est.strftime('%B %d, %Y %-I:%M %p %Z'))}|
 |**Game Duration**|{duration}|
 |**Officials**|{officials}|
-"""
+"""]
 
     # Line score
-    body += '\n##### Line Score\n'
-    body += f'\n{self._build_linescore(boxscore, teams)}\n'
+    body.append('\n##### Line Score\n')
+    body.append(f'\n{self._build_linescore(boxscore, teams)}\n')
 
     # Team stats
     allStats = boxscore["stats"]
     playerStats = allStats["activePlayers"]
-    body += """
+    vStats = allStats["vTeam"]
+    hStats = allStats["hTeam"]
+    vtot = vStats["totals"]
+    htot = hStats["totals"]
+    vlead = self._plusminus(vStats['biggestLead'])
+    hlead = self._plusminus(hStats['biggestLead'])
+    body.append(f"""
 ##### Team Stats
 
 |**Team**|**PTS**|**FG**|**FG%**|**3P**|**3P%**|**FT**|**FT%**|**OREB**|**TREB**|**AST**|**PF**|**STL**|**TO**|**BLK**|
 |:--|:--:|:--:|:--:|:--:|:--:|:--:|:--:|:--:|:--:|:--:|:--:|:--:|:--:|:--:|
-|{vTeamName}|{vpts}|{vfgm}-{vfga}|{vfgp}%|{vtpm}-{vtpa}|{vtpp}%|{vftm}-{vfta}|{vftp}%|{voreb}|{vtreb}|{vast}|{vpf}|{vstl}|{vto}|{vblk}|
-|{hTeamName}|{hpts}|{hfgm}-{hfga}|{hfgp}%|{htpm}-{htpa}|{htpp}%|{hftm}-{hfta}|{hftp}%|{horeb}|{htreb}|{hast}|{hpf}|{hstl}|{hto}|{hblk}|
+|{vTeam.full_name}|{vtot['points']}|{vtot['fgm']}-{vtot['fga']}|{vtot['fgp']}%|{vtot['tpm']}-{vtot['tpa']}|{vtot['tpp']}%|{vtot['ftm']}-{vtot['fta']}|{vtot['ftp']}%|{vtot['offReb']}|{vtot['totReb']}|{vtot['assists']}|{vtot['pFouls']}|{vtot['steals']}|{vtot['turnovers']}|{vtot['blocks']}|
+|{hTeam.full_name}|{htot['points']}|{htot['fgm']}-{htot['fga']}|{htot['fgp']}%|{htot['tpm']}-{htot['tpa']}|{htot['tpp']}%|{htot['ftm']}-{htot['fta']}|{htot['ftp']}%|{htot['offReb']}|{htot['totReb']}|{htot['assists']}|{htot['pFouls']}|{htot['steals']}|{htot['turnovers']}|{htot['blocks']}|
 
 |**Team**|**Biggest Lead**|**Longest Run**|**PTS: In Paint**|**PTS: Off TOs**|**PTS: Fastbreak**|
 |:--|:--:|:--:|:--:|:--:|:--:|
-|{vTeamName}|{vlead}|{vrun}|{vpaint}|{vpto}|{vfb}|
-|{hTeamName}|{hlead}|{hrun}|{hpaint}|{hpto}|{hfb}|
-  """.format(
-      vTeamName=vTeamFullName,
-      vpts=allStats["vTeam"]["totals"]["points"],
-      vfgm=allStats["vTeam"]["totals"]["fgm"],
-      vfga=allStats["vTeam"]["totals"]["fga"],
-      vfgp=allStats["vTeam"]["totals"]["fgp"],
-      vtpm=allStats["vTeam"]["totals"]["tpm"],
-      vtpa=allStats["vTeam"]["totals"]["tpa"],
-      vtpp=allStats["vTeam"]["totals"]["tpp"],
-      vftm=allStats["vTeam"]["totals"]["ftm"],
-      vfta=allStats["vTeam"]["totals"]["fta"],
-      vftp=allStats["vTeam"]["totals"]["ftp"],
-      voreb=allStats["vTeam"]["totals"]["offReb"],
-      vtreb=allStats["vTeam"]["totals"]["totReb"],
-      vast=allStats["vTeam"]["totals"]["assists"],
-      vpf=allStats["vTeam"]["totals"]["pFouls"],
-      vstl=allStats["vTeam"]["totals"]["steals"],
-      vto=allStats["vTeam"]["totals"]["turnovers"],
-      vblk=allStats["vTeam"]["totals"]["blocks"],
-      hTeamName=hTeamFullName,
-      hpts=allStats["hTeam"]["totals"]["points"],
-      hfgm=allStats["hTeam"]["totals"]["fgm"],
-      hfga=allStats["hTeam"]["totals"]["fga"],
-      hfgp=allStats["hTeam"]["totals"]["fgp"],
-      htpm=allStats["hTeam"]["totals"]["tpm"],
-      htpa=allStats["hTeam"]["totals"]["tpa"],
-      htpp=allStats["hTeam"]["totals"]["tpp"],
-      hftm=allStats["hTeam"]["totals"]["ftm"],
-      hfta=allStats["hTeam"]["totals"]["fta"],
-      hftp=allStats["hTeam"]["totals"]["ftp"],
-      horeb=allStats["hTeam"]["totals"]["offReb"],
-      htreb=allStats["hTeam"]["totals"]["totReb"],
-      hast=allStats["hTeam"]["totals"]["assists"],
-      hpf=allStats["hTeam"]["totals"]["pFouls"],
-      hstl=allStats["hTeam"]["totals"]["steals"],
-      hto=allStats["hTeam"]["totals"]["turnovers"],
-      hblk=allStats["hTeam"]["totals"]["blocks"],
-      vlead=self._plusminus(allStats["vTeam"]["biggestLead"]),
-      vrun=allStats["vTeam"]["longestRun"],
-      vpaint=allStats["vTeam"]["pointsInPaint"],
-      vpto=allStats["vTeam"]["pointsOffTurnovers"],
-      vfb=allStats["vTeam"]["fastBreakPoints"],
-      hlead=self._plusminus(allStats["hTeam"]["biggestLead"]),
-      hrun=allStats["hTeam"]["longestRun"],
-      hpaint=allStats["hTeam"]["pointsInPaint"],
-      hpto=allStats["hTeam"]["pointsOffTurnovers"],
-      hfb=allStats["hTeam"]["fastBreakPoints"]
-    )
-
-    body += """
+|{vTeam.full_name}|{vlead}|{vStats['longestRun']}|{vStats['pointsInPaint']}|{vStats['pointsOffTurnovers']}|{vStats['fastBreakPoints']}|
+|{hTeam.full_name}|{hlead}|{hStats['longestRun']}|{hStats['pointsInPaint']}|{hStats['pointsOffTurnovers']}|{hStats['fastBreakPoints']}|
+  """)
+
+    vLeaders = vStats["leaders"]
+    hLeaders = hStats["leaders"]
+
+    def leader(category):
+      value = category['value']
+      player = category['players'][0]
+      return f"**{value}** {player['firstName']} {player['lastName']}"
+
+    body.append(f"""
 ##### Team Leaders
 
 |**Team**|**Points**|**Rebounds**|**Assists**|
 |:--|:--|:--|:--|
-|{vTeam}|**{vpts}** {vply1}|**{vreb}** {vply2}|**{vast}** {vply3}|
-|{hTeam}|**{hpts}** {hply1}|**{hreb}** {hply2}|**{hast}** {hply3}|
-""".format(
-      vTeam=vTeamFullName,
-      vpts=allStats["vTeam"]["leaders"]["points"]["value"],
-      vply1=allStats["vTeam"]["leaders"]["points"]["players"][0]["firstName"] + " " +
-            allStats["vTeam"]["leaders"]["points"]["players"][0]["lastName"],
-      vreb=allStats["vTeam"]["leaders"]["rebounds"]["value"],
-      vply2=allStats["vTeam"]["leaders"]["rebounds"]["players"][0]["firstName"] + " " +
-            allStats["vTeam"]["leaders"]["rebounds"]["players"][0]["lastName"],
-      vast=allStats["vTeam"]["leaders"]["assists"]["value"],
-      vply3=allStats["vTeam"]["leaders"]["assists"]["players"][0]["firstName"] + " " +
-            allStats["vTeam"]["leaders"]["assists"]["players"][0]["lastName"],
-      hTeam=hTeamFullName,
-      hpts=allStats["hTeam"]["leaders"]["points"]["value"],
-      hply1=allStats["hTeam"]["leaders"]["points"]["players"][0]["firstName"] + " " +
-            allStats["hTeam"]["leaders"]["points"]["players"][0]["lastName"],
-      hreb=allStats["hTeam"]["leaders"]["rebounds"]["value"],
-      hply2=allStats["hTeam"]["leaders"]["rebounds"]["players"][0]["firstName"] + " " +
-            allStats["hTeam"]["leaders"]["rebounds"]["players"][0]["lastName"],
-      hast=allStats["hTeam"]["leaders"]["assists"]["value"],
-      hply3=allStats["hTeam"]["leaders"]["assists"]["players"][0]["firstName"] + " " +
-            allStats["hTeam"]["leaders"]["assists"]["players"][0]["lastName"]
-    )
+|{vTeam.full_name}|{leader(vLeaders['points'])}|{leader(vLeaders['rebounds'])}|{leader(vLeaders['assists'])}|
+|{hTeam.full_name}|{leader(hLeaders['points'])}|{leader(hLeaders['rebounds'])}|{leader(hLeaders['assists'])}|
+""")
 
     # Player stats.
     # Only starters have a "pos" property.
@@ -451,27 +494,38 @@ class GameThreadBot:
               f'|**+/-**|**PTS**|\n'
               f'|:--|:--|:--:|:--:|:--:|:--:|:--:|:--:|:--:|:--:|:--:|:--:|'
               f':--:|:--:|:--:|\n')
-    away_players_stat_str = build_player_stat_header(vTeamNickname)
-    home_players_stat_str = build_player_stat_header(hTeamNickname)
-    for i in range(len(playerStats)):
-      stats = playerStats[i]
-      player_name = f'{stats["firstName"]} {stats["lastName"]}'
+    plusminus = self._plusminus
+
+    def player_stat_row(stats):
       position = f'^{stats["pos"]}' if stats["pos"] else ''
-      stat_str = (f'|{player_name}{position}|{stats["min"]}|'
-                  f'{stats["fgm"]}-{stats["fga"]}|{stats["tpm"]}-{stats["tpa"]}|'
-                  f'{stats["ftm"]}-{stats["fta"]}|{stats["offReb"]}|'
-                  f'{stats["defReb"]}|{stats["totReb"]}|{stats["assists"]}|'
-                  f'{stats["steals"]}|{stats["blocks"]}|{stats["turnovers"]}|'
-                  f'{stats["pFouls"]}|{self._plusminus(stats["plusMinus"])}|'
-                  f'{stats["points"]}|\n')
-      if stats["teamId"] == vTeamBasicData["teamId"]:
-        away_players_stat_str += stat_str
-      else:
-        home_players_stat_str += stat_str
-    body += '\n##### Player Stats\n'
-    body += away_players_stat_str
-    body += home_players_stat_str
-    return body
+      return '|'.join((
+          '',
+          f'{stats["firstName"]} {stats["lastName"]}{position}',
+          stats["min"],
+          f'{stats["fgm"]}-{stats["fga"]}',
+          f'{stats["tpm"]}-{stats["tpa"]}',
+          f'{stats["ftm"]}-{stats["fta"]}',
+          stats["offReb"],
+          stats["defReb"],
+          stats["totReb"],
+          stats["assists"],
+          stats["steals"],
+          stats["blocks"],
+          stats["turnovers"],
+          stats["pFouls"],
+          plusminus(stats["plusMinus"]),
+          stats["points"],
+          '\n'))
+
+    vtid = vTeam.team_id
+    body.append('\n##### Player Stats\n')
+    body.append(build_player_stat_header(vTeam.nickname))
+    body.extend([player_stat_row(stats) for stats in playerStats
+                 if stats["teamId"] == vtid])
+    body.append(build_player_stat_header(hTeam.nickname))
+    body.extend([player_stat_row(stats) for stats in playerStats
+                 if stats["teamId"] != vtid])
+    return ''.join(body)
 
   def _build_linescore(self, boxscore, teams):
     """Builds a table of points scored in each quarter, including overtime.
@@ -481,56 +535,61 @@ class GameThreadBot:
     basic_game_data = boxscore["basicGameData"]
     current_period = int(basic_game_data['period']['current'])
 
-    home_team = basic_game_data["hTeam"]
-    home_score = home_team["linescore"]
-    home_team_name = teams[home_team['teamId']]['fullName']
+    home_team = self._team_view(teams, basic_game_data["hTeam"])
+    home_score = home_team.linescore
+    home_team_name = home_team.full_name
 
-    road_team = basic_game_data["vTeam"]
-    road_score = road_team["linescore"]
-    road_team_name = teams[road_team['teamId']]['fullName']
+    road_team = self._team_view(teams, basic_game_data["vTeam"])
+    road_score = road_team.linescore
+    road_team_name = road_team.full_name
 
     assert len(home_score) == len(road_score)
     num_periods = len(home_score)
     if num_periods == 0:
       return None
 
-    header1 = """|**Team**|"""
-    header2 = '|:---|'
-    home_team_line = f'|{home_team_name}|'
-    road_team_line = f'|{road_team_name}|'
-    for i in range(0, max(4, num_periods)):
-      period = i + 1
-      header1 += f'**Q{period}**|' if period < 5 else f'**OT{period - 4}**|'
-      header2 += ':--:|'
-      home_team_line += f'{self._points(home_score, current_period, period)}|'
-      road_team_line += f'{self._points(road_score, current_period, period)}|'
-
-    # Totals
-    header1 += '**Total**|'
-    header2 += ':--:|'
-    home_team_line += f'{home_team["score"]}|'
-    road_team_line += f'{road_team["score"]}|'
-
-    return f'{header1}\n{header2}\n{road_team_line}\n{home_team_line}'
+    num_columns = max(4, num_periods)
+
+    def points(linescore):
+      # Display a hyphen for quarters that haven't started yet even though they
+      # report it with a score of 0. Always display overtime data if present.
+      return ['-' if i >= num_periods
+              or (linescore[i]['score'] == '0'
+                  and i >= current_period
+                  and current_period <= 4)
+              else linescore[i]['score']
+              for i in range(num_columns)]
+
+    periods = [f'**Q{i + 1}**' if i < 4 else f'**OT{i - 3}**'
+               for i in range(num_columns)]
+    header1 = ['|**Team**', *periods, '**Total**']
+    header2 = ['|:---', *[':--:'] * num_columns, ':--:']
+    home_team_line = [
+        f'|{home_team_name}', *points(home_score), home_team.score]
+    road_team_line = [
+        f'|{road_team_name}', *points(road_score), road_team.score]
+
+    lines = [header1, header2, road_team_line, home_team_line]
+    return '\n'.join('|'.join(line) + '|' for line in lines)
 
   def _build_starters_table(self, boxscore, teams):
     if 'stats' not in boxscore or 'activePlayers' not in boxscore['stats']:
       return None
-    hteamid = boxscore['basicGameData']['hTeam']['teamId']
-    vteamid = boxscore['basicGameData']['vTeam']['teamId']
+    hteam = self._team_view(teams, boxscore['basicGameData']['hTeam'])
+    vteam = self._team_view(teams, boxscore['basicGameData']['vTeam'])
     away = []
     home = []
     for i in range(len(boxscore["stats"]["activePlayers"])):
       stats = boxscore["stats"]["activePlayers"][i]
       if stats["pos"]:
         player_name = f'{stats["firstName"]} {stats["lastName"]}'
-        arr = away if stats["teamId"] == vteamid else home
+        arr = away if stats["teamId"] == vteam.team_id else home
         arr.append(f'{player_name} ({stats["pos"]})')
-    result = f'{teams[vteamid]["fullName"]}|{teams[hteamid]["fullName"]}|\n'
-    result += ':--|:--|\n'
+    result = [f'{vteam.full_name}|{hteam.full_name}|\n']
+    result.append(':--|:--|\n')
     for away_player, home_player in zip(away, home):
-      result += f'{away_player}|{home_player}|\n'
-    return result
+      result.append(f'{away_player}|{home_player}|\n')
+    return ''.join(result)
 
   def _build_inactive_table(self, boxscore, teams, year):
     """Builds a markdown table of players on each team that are inactive.
@@ -542,49 +601,74 @@ class GameThreadBot:
 
     # Build a lookup table of active player ids.
     active_players = boxscore["stats"]["activePlayers"]
-    active_player_ids = set(map(lambda p: p['personId'], active_players))
+    active_player_ids = {p['personId'] for p in active_players}
 
-    hteamid = boxscore['basicGameData']['hTeam']['teamId']
-    vteamid = boxscore['basicGameData']['vTeam']['teamId']
+    hteam = self._team_view(teams, boxscore['basicGameData']['hTeam'])
+    vteam = self._team_view(teams, boxscore['basicGameData']['vTeam'])
 
-    # Lookup each team's roster from the NBA API.
-    hroster = self.nba_service.roster(teams[hteamid]['urlName'], year)
-    vroster = self.nba_service.roster(teams[vteamid]['urlName'], year)
+    # Lookup each team's roster from the NBA API (in parallel).
+    with ThreadPoolExecutor(max_workers=2) as executor:
+      hroster_future = executor.submit(
+          self.nba_service.roster, hteam.url_name, year)
+      vroster_future = executor.submit(
+          self.nba_service.roster, vteam.url_name, year)
+      hroster = hroster_future.result()
+      vroster = vroster_future.result()
 
     # Figure out whose inactive by comparing the team roster to active players.
-    hteam_inactive_player_ids = set(filter(
-        lambda pid: pid not in active_player_ids, hroster))
-    vteam_inactive_player_ids = set(filter(
-        lambda pid: pid not in active_player_ids, vroster))
+    hteam_inactive_player_ids = set(hroster) - active_player_ids
+    vteam_inactive_player_ids = set(vroster) - active_player_ids
 
     # Don't do anything if there's no inactive players.
-    total_inactive = len(hteam_inactive_player_ids) + len(vteam_inactive_player_ids)
-    if total_inactive == 0:
+    inactive_player_ids = hteam_inactive_player_ids | vteam_inactive_player_ids
+    if not inactive_player_ids:
       return None
 
     # Convert personIds to "Player Name (Position)" string.
     def player_str(player):
       pos = f' ({player["pos"].replace("-", "/")})' if player["pos"] else ''
       return f'{player["firstName"]} {player["lastName"]}{pos}'
-    hinactive = []
-    vinactive = []
-    for player in self.nba_service.players(year):
-      if player["personId"] in hteam_inactive_player_ids:
-        hinactive.append(player_str(player))
-      if player["personId"] in vteam_inactive_player_ids:
-        vinactive.append(player_str(player))
-      # Terminate loop if we've already got everything we need.
-      if len(hinactive) + len(vinactive) == total_inactive:
-        break
+    inactive_players = [p for p in self.nba_service.players(year)
+                        if p["personId"] in inactive_player_ids]
+    hinactive = [player_str(p) for p in inactive_players
+                 if p["personId"] in hteam_inactive_player_ids]
+    vinactive = [player_str(p) for p in inactive_players
+                 if p["personId"] in vteam_inactive_player_ids]
 
     # Build up the table.
-    result = f'|{teams[vteamid]["fullName"]}|{teams[hteamid]["fullName"]}|\n'
-    result += '|:--|:--|\n'
+    result = [f'|{vteam.full_name}|{hteam.full_name}|\n']
+    result.append('|:--|:--|\n')
     for i in range(max(len(hinactive), len(vinactive))):
       hplayer = hinactive[i] if i < len(hinactive) else ''
       vplayer = vinactive[i] if i < len(vinactive) else ''
-      result += f'|{vplayer}|{hplayer}|\n'
-    return result
+      result.append(f'|{vplayer}|{hplayer}|\n')
+    return ''.join(result)
+
+  @staticmethod
+  def _team_view(teams, team_data):
+    """Combines a team's data from the boxscore feed (i.e., "hTeam") with its
+    metadata from the teams feed so builders can read both from one place."""
+    team = teams[team_data['teamId']]
+    return TeamView(
+        team_id=team_data['teamId'],
+        tri_code=team_data['triCode'],
+        tri_code_slug=team_data['triCode'].lower(),
+        full_name=team['fullName'],
+        full_name_slug=team['fullName'].lower().replace(' ', '-'),
+        nickname=team['nickname'],
+        url_name=team['urlName'],
+        subreddit=TEAM_SUB_MAP[team['nickname']],
+        win=team_data['win'],
+        loss=team_data['loss'],
+        score=team_data['score'],
+        linescore=team_data['linescore'])
+
+  @staticmethod
+  def _clock_time(time):
+    """Same as time.strftime('%I:%M %p') (i.e., "07:30 PM") without having to
+    parse a format string."""
+    am_pm = 'PM' if time.hour >= 12 else 'AM'
+    return f'{(time.hour - 1) % 12 + 1:02d}:{time.minute:02d} {am_pm}'
 
   @staticmethod
   def _plusminus(someStat):
@@ -592,58 +676,107 @@ class GameThreadBot:
       return "+" + str(someStat)
     return str(someStat)
 
-  @staticmethod
-  def _points(linescore, current_period, requested_period):
-    """Returns a string for the number of points in a quarter, or '-' if the
-    quarter hasn't started yet.
+  def _get_username(self):
+    """Returns the name of the account the bot is running as. This is looked
+    up from reddit the first time it's needed and then reused."""
+    if self._username is None:
+      self._username = self.reddit.user.me(False).name
+    return self._username
+
+  def _is_obsolete(self, created_utc):
+    """Returns true if a post created at created_utc (seconds since the epoch)
+    is too old for the bot to keep updating."""
+    created = datetime.fromtimestamp(created_utc, UTC)
+    return created + timedelta(hours=MAX_POST_AGE_HOURS) < self.now
+
+  def _get_saved_thread(self, state_key):
+    """Returns the submission a previous run created or found for this game, or
+    None if there isn't one we can still update (i.e., it's too old or it was
+    deleted)."""
+    if self.state is None:
+      return None
+    saved = self.state.get(state_key)
+    if saved is None or self._is_obsolete(saved['created_utc']):
+      return None
+    thread = self.reddit.submission(id=saved['id'])
+    # Deleted posts don't have an author anymore.
+    if thread.author != self._get_username():
+      self.logger.info(f'Saved submission {saved["id"]} is not ours anymore.')
+      return None
+    self.logger.debug(f'Using saved submission {saved["id"]}.')
+    return thread
 
-    Parameters
-    ----------
-    linescore: object
-      NBA data object for the linescore.
-    current_period: int
-      The period/quarter NBA says the game is currently in.
-    requested_period: int
-      The period the caller wants to display.
-    """
-    points = linescore[(requested_period - 1)]['score'] \
-      if len(linescore) > requested_period - 1 else '-'
-    # Display a hyphen for quarters that haven't started yet even though they
-    # report it with a score of 0. Always display overtime data if present.
-    if (points == '0'
-        and requested_period > current_period
-        and current_period <= 4):
-      points = '-'
-    return points
-
-  def _create_or_update_game_thread(self, act, title, body):
-    thread = None
-    username = self.reddit.user.me(False).name
+  def _create_or_update_game_thread(self, act, title, body, game_id=None):
+    state_key = f'{act.name}:{game_id}'
+    thread = self._get_saved_thread(state_key) if game_id else None
+    saved = thread is not None
+    if not saved:
+      thread = self._find_thread(act)
 
+    if thread is None:
+      thread = self.subreddit.submit(title, selftext=body, send_replies=False)
+      thread.mod.sticky()
+      # Looking up created_utc would fetch the whole post again.
+      created_utc = self.now.timestamp()
+      self.logger.info(f'Created a new thread with title "{thread.title}".')
+    else:
+      created_utc = thread.created_utc
+      if thread.selftext.strip() == body.strip():
+        self.logger.info(
+            f'Text of "{thread.title}" did not change. Not updating.')
+      else:
+        thread.edit(body)
+        self.logger.info(f'Updated "{thread.title}".')
+
+    # Remember the thread so the next run doesn't have to look for it again.
+    if not saved and game_id and self.state is not None:
+      self.state.put(state_key, {'id': thread.id, 'created_utc': created_utc})
+
+  def _find_thread(self, act):
+    """Looks through the newest posts in the sub for a thread the bot made
+    earlier for the current game. Returns None if there isn't one."""
     # Unfortunately subreddit.search sometimes lags by as much as 2-3 minutes.
     # This introduces a risk of spamming the sub with autogenerated posts because
     # this algorithm will create a new thread if doesn't find an already existing
     # one. Instead it's using subreddit.new() which seems to work better but does
     # does return a lot of extraneous results.
     q = GAME_THREAD_PREFIX if act == Action.DO_GAME_THREAD else POST_GAME_PREFIX
-    for submission in self.subreddit.new(limit=300):
+    for submission in self.subreddit.new(limit=MAX_POSTS_TO_SCAN):
       # Need to make sure that we don't incorrectly update an old/obsolete post.
-      created_utc = datetime.fromtimestamp(submission.created_utc, UTC)
-      is_obsolete = created_utc + timedelta(hours=MAX_POST_AGE_HOURS) < self.now
-      is_bot_post = submission.author == username
-      if submission.title.startswith(q) and is_bot_post and not is_obsolete:
-        thread = submission
+      # Posts come back newest first so everything after this one is older.
+      if self._is_obsolete(submission.created_utc):
         break
-
-    if thread is None:
-      thread = self.subreddit.submit(title, selftext=body, send_replies=False)
-      thread.mod.sticky()
-      self.logger.info(f'Created a new thread with title "{thread.title}".')
-    elif thread.selftext.strip() == body.strip():
-      self.logger.info(f'Text of "{thread.title}" did not change. Not updating.')
-    else:
-      thread.edit(body)
-      self.logger.info(f'Updated "{thread.title}".')
+      # Cheap checks first. Only look at the author (and look up who we are)
+      # once there's a post that could be ours.
+      if not submission.title.startswith(q):
+        continue
+      if submission.author == self._get_username():
+        return submission
+    return None
+
+
+class TeamView(NamedTuple):
+  """One team's side of a game, see GameThreadBot._team_view."""
+  team_id: str
+  tri_code: str
+  tri_code_slug: str  # For URLs, i.e. "nyk".
+  full_name: str
+  full_name_slug: str  # For URLs, i.e. "new-york-knicks".
+  nickname: str
+  url_name: str
+  subreddit: str
+  win: str
+  loss: str
+  score: str
+  linescore: list
+
+
+class GameOutcome(NamedTuple):
+  """How a finished game went, see GameThreadBot._game_outcome."""
+  home_score: int
+  road_score: int
+  diff: int
+  knicks_won: bool
 
 
 class Action(Enum):
@@ -653,33 +786,39 @@ class Action(Enum):
 
 
 if __name__ == '__main__':
-  parser = OptionParser()
-  parser.add_option(
-      "-u",
-      "--user",
-      dest="username",
-      help="Reddit account for the bot to run as.",
-      metavar='[username]')
-  (options, args) = parser.parse_args()
+  parser = argparse.ArgumentParser()
+  parser.add_argument(
+      'subreddit', help='Name of the subreddit to manage, i.e. NYKnicks.')
+  parser.add_argument(
+      '-u',
+      '--user',
+      dest='username',
+      default='nyknicks-automod',
+      help='Reddit account for the bot to run as.',
+      metavar='username')
+  args = parser.parse_args()
 
   logging.config.fileConfig('logging.conf')
   logger = logging.getLogger('game_thread_bot')
 
-  if len(args) != 1:
-    logger.error(f'Invalid command line arguments: {args}')
-    raise SystemExit(f'Usage: {sys.argv[0]} subreddit')
-
-  subreddit_name = args[0]
-  username = options.username if options.username else 'nyknicks-automod'
+  subreddit_name = args.subreddit
+  username = args.username
   logger.info(f'Using subreddit "{subreddit_name}" and user "{username}".')
 
   # now = datetime(2021, 2, 26, 0, 0, 0, 0, UTC)
   now = datetime.now(UTC)
 
   try:
-    nba_service = NbaService(logger)
-    reddit = praw.Reddit(username, validate_on_submit=True)
-    bot = GameThreadBot(logger, nba_service, now, reddit, subreddit_name, 0)
+    nba_service = NbaService(
+        logger, os.path.join(STATE_DIRECTORY, 'nba_cache'))
+    def create_reddit():
+      import praw
+      logger.info('Logging in to reddit.')
+      return praw.Reddit(username, validate_on_submit=True)
+
+    state = FileCache(os.path.join(STATE_DIRECTORY, 'game_thread_bot.json'))
+    bot = GameThreadBot(
+        logger, nba_service, now, create_reddit, subreddit_name, 0, state)
     bot.run()
   except:
     logger.error(traceback.format_exc())
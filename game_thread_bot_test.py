@@ -1,11 +1,18 @@
 from constants import UTC
 from datetime import datetime, timedelta
-from game_thread_bot import DEFEAT_SYNONYMS, GAME_THREAD_PREFIX, POST_GAME_PREFIX
-from game_thread_bot import Action, GameThreadBot
+from game_thread_bot import BIG_WIN_SYNONYMS, BLOWOUT_WIN_SYNONYMS
+from game_thread_bot import CLOSE_WIN_SYNONYMS, LOSS_SYNONYMS
+from game_thread_bot import NARROW_WIN_SYNONYMS, WIN_SYNONYMS
+from game_thread_bot import GAME_THREAD_PREFIX, POST_GAME_PREFIX
+from game_thread_bot import MAX_POSTS_TO_SCAN, Action, GameOutcome
+from game_thread_bot import GameThreadBot
 from services.fake_nba_service import FakeNbaService
+from services.file_cache import FileCache
 from unittest.mock import MagicMock, patch
 
 import logging.config
+import os.path
+import tempfile
 import unittest
 
 EXPECTED_GAMETHREAD_TEXT = """##### General Information
@@ -148,19 +155,110 @@ class GameThreadBotTest(unittest.TestCase):
     self.logger = logging.getLogger(__name__)
     self.fake_nba_service = FakeNbaService()
     self.mock_praw = mock_praw
-    self.mock_reddit = MagicMock(['subreddit', 'user'])
+    self.mock_reddit = MagicMock(['submission', 'subreddit', 'user'])
     self.mock_reddit.user = FakeUser('nyknicks-automod')
     self.mock_praw.return_value = self.mock_reddit
     self.mock_subreddit = MagicMock(['new', 'search', 'submit'])
     self.mock_reddit.subreddit.return_value = self.mock_subreddit
 
-  def bot(self, now: datetime):
+  def bot(self, now: datetime, state: FileCache = None):
     return GameThreadBot(
         logger=self.logger,
         nba_service=self.fake_nba_service,
         now=now,
-        reddit=self.mock_reddit,
-        subreddit_name='test_NYKnicks')
+        reddit_factory=lambda: self.mock_reddit,
+        subreddit_name='test_NYKnicks',
+        state=state)
+
+  def test_run_noGameSoon_remembersIdleUntil(self):
+    # Next game (20201229/NYKCLE) starts at 2020-12-30T00:00:00.000Z.
+    now = datetime(2020, 12, 29, 12, 0, 0, 0, UTC)
+    with tempfile.TemporaryDirectory() as temp_dir:
+      state = FileCache(os.path.join(temp_dir, 'state.json'))
+
+      self.bot(now, state).run()
+
+      # Never waits longer than an hour.
+      self.assertEqual(
+          state.get('idle_until'), '2020-12-29T13:00:00+00:00')
+      self.mock_subreddit.new.assert_not_called()
+
+  def test_run_noGameSoon_idleUntilHourBeforeTipoff(self):
+    # Next game (20201229/NYKCLE) starts at 2020-12-30T00:00:00.000Z.
+    now = datetime(2020, 12, 29, 22, 30, 0, 0, UTC)
+    with tempfile.TemporaryDirectory() as temp_dir:
+      state = FileCache(os.path.join(temp_dir, 'state.json'))
+
+      self.bot(now, state).run()
+
+      self.assertEqual(
+          state.get('idle_until'), '2020-12-29T23:00:00+00:00')
+
+  def test_save_idle_until_recentGame_doesNotGoIdle(self):
+    # The last game started recently but has no score yet, so a post game thread
+    # could still be needed soon.
+    now = datetime(2021, 1, 1, 1, 30, 0, 0, UTC)
+    schedule = {
+      "league": {
+        "lastStandardGamePlayedIndex": 0,
+        "standard": [
+          {
+            'gameUrlCode': '20201231/NYKTOR',
+            'startTimeUTC': '2021-01-01T00:30:00.000Z',
+            'vTeam': {'score': ''},
+            'hTeam': {'score': ''},
+          },
+        ],
+      }
+    }
+    with tempfile.TemporaryDirectory() as temp_dir:
+      state = FileCache(os.path.join(temp_dir, 'state.json'))
+
+      self.bot(now, state)._save_idle_until(schedule)
+
+      self.assertIsNone(state.get('idle_until'))
+
+  def test_run_noGameSoon_doesNotCreateReddit(self):
+    now = datetime(2020, 12, 29, 12, 0, 0, 0, UTC)
+    reddit_factory = MagicMock()
+
+    GameThreadBot(
+        logger=self.logger,
+        nba_service=self.fake_nba_service,
+        now=now,
+        reddit_factory=reddit_factory,
+        subreddit_name='test_NYKnicks').run()
+
+    reddit_factory.assert_not_called()
+
+  def test_run_whileIdle_doesNotCreateReddit(self):
+    now = datetime(2020, 12, 29, 12, 0, 0, 0, UTC)
+    reddit_factory = MagicMock()
+    with tempfile.TemporaryDirectory() as temp_dir:
+      state = FileCache(os.path.join(temp_dir, 'state.json'))
+      state.put('idle_until', '2020-12-29T12:30:00+00:00')
+
+      GameThreadBot(
+          logger=self.logger,
+          nba_service=self.fake_nba_service,
+          now=now,
+          reddit_factory=reddit_factory,
+          subreddit_name='test_NYKnicks',
+          state=state).run()
+
+      reddit_factory.assert_not_called()
+
+  def test_run_whileIdle_doesNothing(self):
+    now = datetime(2020, 12, 29, 12, 0, 0, 0, UTC)
+    with tempfile.TemporaryDirectory() as temp_dir:
+      state = FileCache(os.path.join(temp_dir, 'state.json'))
+      state.put('idle_until', '2020-12-29T12:30:00+00:00')
+      self.fake_nba_service = MagicMock()
+
+      self.bot(now, state).run()
+
+      self.fake_nba_service.current_year.assert_not_called()
+      self.fake_nba_service.schedule.assert_not_called()
 
   def test_run_createGameThread(self):
     # 1 hour before tip-off.
@@ -219,6 +317,145 @@ class GameThreadBotTest(unittest.TestCase):
     self.assertEqual(shitpost.selftext, 'better shut up')
     self.assertEqual(otherthread.selftext, "it's happening!")
 
+  def test_run_createGameThread_savesSubmissionId(self):
+    # 1 hour before tip-off.
+    now = datetime(2020, 12, 29, 23, 0, 0, 0, UTC)
+    self.mock_subreddit.new.return_value = []
+    self.mock_subreddit.submit.return_value = MagicMock(
+        mod=MagicMock(['sticky']), title='game thread', id='newthread')
+    with tempfile.TemporaryDirectory() as temp_dir:
+      state = FileCache(os.path.join(temp_dir, 'state.json'))
+
+      # Execute.
+      self.bot(now, state).run()
+
+      # Verify.
+      self.assertEqual(
+          state.get('DO_GAME_THREAD:0022000046'),
+          {'id': 'newthread', 'created_utc': now.timestamp()})
+
+  def test_run_withSavedGameThread_skipsScanAndUpdates(self):
+    # 1 hour before tip-off.
+    now = datetime(2020, 12, 29, 23, 0, 0, 0, UTC)
+    gamethread = FakeThread(
+        author='nyknicks-automod',
+        created_utc=now,
+        selftext='we did it!',
+        title=f'{GAME_THREAD_PREFIX} A classic match of Good vs. Evil',
+        id='savedthread')
+    self.mock_reddit.submission.return_value = gamethread
+    with tempfile.TemporaryDirectory() as temp_dir:
+      state = FileCache(os.path.join(temp_dir, 'state.json'))
+      state.put(
+          'DO_GAME_THREAD:0022000046',
+          {'id': 'savedthread', 'created_utc': now.timestamp()})
+
+      # Execute.
+      self.bot(now, state).run()
+
+      # Verify.
+      self.mock_reddit.submission.assert_called_once_with(id='savedthread')
+      self.mock_subreddit.new.assert_not_called()
+      self.mock_subreddit.submit.assert_not_called()
+      self.assertEqual(gamethread.selftext, EXPECTED_GAMETHREAD_TEXT)
+
+  def test_run_withDeletedSavedGameThread_createsNewThread(self):
+    # 1 hour before tip-off.
+    now = datetime(2020, 12, 29, 23, 0, 0, 0, UTC)
+    self.mock_reddit.submission.return_value = FakeThread(
+        author=None, created_utc=now, selftext='[deleted]', id='savedthread')
+    self.mock_subreddit.new.return_value = []
+    self.mock_subreddit.submit.return_value = MagicMock(
+        mod=MagicMock(['sticky']), title='game thread', id='newthread')
+    with tempfile.TemporaryDirectory() as temp_dir:
+      state = FileCache(os.path.join(temp_dir, 'state.json'))
+      state.put(
+          'DO_GAME_THREAD:0022000046',
+          {'id': 'savedthread', 'created_utc': now.timestamp()})
+
+      # Execute.
+      self.bot(now, state).run()
+
+      # Verify.
+      self.mock_subreddit.new.assert_called_once()
+      self.mock_subreddit.submit.assert_called_once()
+      self.assertEqual(
+          state.get('DO_GAME_THREAD:0022000046'),
+          {'id': 'newthread', 'created_utc': now.timestamp()})
+
+  def test_run_withObsoleteSavedGameThread_scansForThread(self):
+    # 1 hour before tip-off.
+    now = datetime(2020, 12, 29, 23, 0, 0, 0, UTC)
+    gamethread = FakeThread(
+        author='nyknicks-automod',
+        created_utc=now,
+        selftext='we did it!',
+        title=f'{GAME_THREAD_PREFIX} A classic match of Good vs. Evil',
+        id='otherthread')
+    self.mock_subreddit.new.return_value = [gamethread]
+    with tempfile.TemporaryDirectory() as temp_dir:
+      state = FileCache(os.path.join(temp_dir, 'state.json'))
+      created = now - timedelta(hours=10)
+      state.put(
+          'DO_GAME_THREAD:0022000046',
+          {'id': 'savedthread', 'created_utc': created.timestamp()})
+
+      # Execute.
+      self.bot(now, state).run()
+
+      # Verify.
+      self.mock_reddit.submission.assert_not_called()
+      self.mock_subreddit.submit.assert_not_called()
+      self.assertEqual(gamethread.selftext, EXPECTED_GAMETHREAD_TEXT)
+      self.assertEqual(
+          state.get('DO_GAME_THREAD:0022000046'),
+          {'id': 'otherthread', 'created_utc': now.timestamp()})
+
+  def test_run_withObsoleteGameThread_stopsScanningAndCreates(self):
+    # 1 hour before tip-off.
+    now = datetime(2020, 12, 29, 23, 0, 0, 0, UTC)
+    obsolete = FakeThread(
+        author='nyknicks-automod',
+        created_utc=now - timedelta(hours=10),
+        selftext='old news',
+        title=f'{GAME_THREAD_PREFIX} Last game')
+    # Posts are returned newest first, so this one should never be reached.
+    unreachable = FakeThread(
+        author='nyknicks-automod',
+        created_utc=now,
+        selftext='out of order',
+        title=f'{GAME_THREAD_PREFIX} Out of order')
+    self.mock_subreddit.new.return_value = [obsolete, unreachable]
+    mock_submit_mod = MagicMock(['sticky'])
+    self.mock_subreddit.submit.return_value = MagicMock(
+        mod=mock_submit_mod, title='game thread')
+
+    # Execute.
+    self.bot(now).run()
+
+    # Verify.
+    self.mock_subreddit.new.assert_called_once_with(limit=MAX_POSTS_TO_SCAN)
+    self.mock_subreddit.submit.assert_called_once()
+    self.assertEqual(obsolete.selftext, 'old news')
+    self.assertEqual(unreachable.selftext, 'out of order')
+
+  def test_run_noMatchingTitles_doesNotLookUpUser(self):
+    # 1 hour before tip-off.
+    now = datetime(2020, 12, 29, 23, 0, 0, 0, UTC)
+    self.mock_reddit.user = MagicMock(['me'])
+    self.mock_subreddit.new.return_value = [
+      FakeThread(author='macdoogles', title="shitpost", created_utc=now),
+    ]
+    self.mock_subreddit.submit.return_value = MagicMock(
+        mod=MagicMock(['sticky']), title='game thread')
+
+    # Execute.
+    self.bot(now).run()
+
+    # Verify.
+    self.mock_reddit.user.me.assert_not_called()
+    self.mock_subreddit.submit.assert_called_once()
+
   @patch('random.choice')
   def test_run_createPostGameThread(self, mock_random):
     # 3.5 hours after tip-off.
@@ -329,9 +566,13 @@ class GameThreadBotTest(unittest.TestCase):
       'hTeam': {'teamId': KNICKS_ID, 'score': '50'},
       'vTeam': {'teamId': '1610612743', 'score': '0'},
     }
-    defeat_synonym = self.bot(now)._build_defeat_synonym(basic_game_data, teams)
-    mock_random.assert_called_once_with(DEFEAT_SYNONYMS[9:14])
+    outcome = GameThreadBot._game_outcome(basic_game_data, teams)
+    defeat_synonym = self.bot(now)._build_defeat_synonym(outcome)
+    mock_random.assert_called_once_with(BLOWOUT_WIN_SYNONYMS)
     self.assertEqual(defeat_synonym, 'defeat')
+    self.assertEqual(
+        BLOWOUT_WIN_SYNONYMS,
+        ('slaughter', 'massacre', 'obliterate', 'eviscerate', 'annihilate'))
 
   @patch('random.choice')
   def test_build_defeat_synonym_winOnTheRoadBy25(self, mock_random):
@@ -342,8 +583,9 @@ class GameThreadBotTest(unittest.TestCase):
       'hTeam': {'teamId': '1610612743', 'score': '0'},
       'vTeam': {'teamId': KNICKS_ID, 'score': '25'},
     }
-    defeat_synonym = self.bot(now)._build_defeat_synonym(basic_game_data, teams)
-    mock_random.assert_called_once_with(DEFEAT_SYNONYMS[3:9])
+    outcome = GameThreadBot._game_outcome(basic_game_data, teams)
+    defeat_synonym = self.bot(now)._build_defeat_synonym(outcome)
+    mock_random.assert_called_once_with(BIG_WIN_SYNONYMS)
     self.assertEqual(defeat_synonym, 'defeat')
 
   @patch('random.choice')
@@ -355,8 +597,9 @@ class GameThreadBotTest(unittest.TestCase):
       'hTeam': {'teamId': KNICKS_ID, 'score': '10'},
       'vTeam': {'teamId': '1610612743', 'score': '0'},
     }
-    defeat_synonym = self.bot(now)._build_defeat_synonym(basic_game_data, teams)
-    mock_random.assert_called_once_with(DEFEAT_SYNONYMS[:3])
+    outcome = GameThreadBot._game_outcome(basic_game_data, teams)
+    defeat_synonym = self.bot(now)._build_defeat_synonym(outcome)
+    mock_random.assert_called_once_with(WIN_SYNONYMS)
     self.assertEqual(defeat_synonym, 'defeat')
 
   @patch('random.choice')
@@ -368,8 +611,9 @@ class GameThreadBotTest(unittest.TestCase):
       'hTeam': {'teamId': '1610612743', 'score': '0'},
       'vTeam': {'teamId': KNICKS_ID, 'score': '5'},
     }
-    defeat_synonym = self.bot(now)._build_defeat_synonym(basic_game_data, teams)
-    mock_random.assert_called_once_with(DEFEAT_SYNONYMS[15:])
+    outcome = GameThreadBot._game_outcome(basic_game_data, teams)
+    defeat_synonym = self.bot(now)._build_defeat_synonym(outcome)
+    mock_random.assert_called_once_with(NARROW_WIN_SYNONYMS)
     self.assertEqual(defeat_synonym, 'defeat')
 
   @patch('random.choice')
@@ -381,8 +625,9 @@ class GameThreadBotTest(unittest.TestCase):
       'hTeam': {'teamId': KNICKS_ID, 'score': '2'},
       'vTeam': {'teamId': NUGGETS_ID, 'score': '0'},
     }
-    defeat_synonym = self.bot(now)._build_defeat_synonym(basic_game_data, teams)
-    mock_random.assert_called_once_with(DEFEAT_SYNONYMS[14:16])
+    outcome = GameThreadBot._game_outcome(basic_game_data, teams)
+    defeat_synonym = self.bot(now)._build_defeat_synonym(outcome)
+    mock_random.assert_called_once_with(CLOSE_WIN_SYNONYMS)
     self.assertEqual(defeat_synonym, 'defeat')
 
   @patch('random.choice')
@@ -394,10 +639,31 @@ class GameThreadBotTest(unittest.TestCase):
       'hTeam': {'teamId': KNICKS_ID, 'score': '0'},
       'vTeam': {'teamId': NUGGETS_ID, 'score': '5'},
     }
-    defeat_synonym = self.bot(now)._build_defeat_synonym(basic_game_data, teams)
-    mock_random.assert_called_once_with(DEFEAT_SYNONYMS[:2])
+    outcome = GameThreadBot._game_outcome(basic_game_data, teams)
+    defeat_synonym = self.bot(now)._build_defeat_synonym(outcome)
+    mock_random.assert_called_once_with(LOSS_SYNONYMS)
     self.assertEqual(defeat_synonym, 'defeat')
 
+  def test_game_outcome_knicksWinOnTheRoad(self):
+    teams = self.fake_nba_service.teams('2020')
+    basic_game_data = {
+      'hTeam': {'teamId': NUGGETS_ID, 'score': '99'},
+      'vTeam': {'teamId': KNICKS_ID, 'score': '104'},
+    }
+    self.assertEqual(
+        GameThreadBot._game_outcome(basic_game_data, teams),
+        GameOutcome(home_score=99, road_score=104, diff=5, knicks_won=True))
+
+  def test_game_outcome_knicksLoseAtHome(self):
+    teams = self.fake_nba_service.teams('2020')
+    basic_game_data = {
+      'hTeam': {'teamId': KNICKS_ID, 'score': '99'},
+      'vTeam': {'teamId': NUGGETS_ID, 'score': '104'},
+    }
+    self.assertEqual(
+        GameThreadBot._game_outcome(basic_game_data, teams),
+        GameOutcome(home_score=99, road_score=104, diff=5, knicks_won=False))
+
   # TODO: More tests needed for post game title generation:
   # - with 1 OT
   # - with many OTs
@@ -583,6 +849,12 @@ class GameThreadBotTest(unittest.TestCase):
          '|Milwaukee Bucks|27|18|30|40|15|10|140|\n'
          '|New York Knicks|30|31|35|19|15|13|143|'))
 
+  def test_clock_time(self):
+    for hour in range(24):
+      time = datetime(2020, 12, 27, hour, 5, 0, 0, UTC)
+      self.assertEqual(
+          GameThreadBot._clock_time(time), time.strftime('%I:%M %p'))
+
   @staticmethod
   def update_boxscore(boxscore, home_scores, road_scores, period):
     def score(scores):
@@ -596,7 +868,9 @@ class GameThreadBotTest(unittest.TestCase):
 
 
 class FakeThread:
-  def __init__(self, author, created_utc: datetime, selftext='', title=''):
+  def __init__(
+      self, author, created_utc: datetime, selftext='', title='', id='abc123'):
+    self.id = id
     self.author = author
     self.created_utc = created_utc.timestamp()
     self.selftext = selftext
@@ -6,10 +6,11 @@ See https://able.bio/rhett/how-to-set-and-get-environment-variables-in-python--2
 """
 
 from apscheduler.schedulers.blocking import BlockingScheduler
-from constants import UTC
+from constants import STATE_DIRECTORY, UTC
 from datetime import datetime
 from decouple import config
 from game_thread_bot import GameThreadBot
+from services.file_cache import FileCache
 from services.nba_service import NbaService
 import logging.config
 import os
@@ -22,7 +23,9 @@ logging.config.fileConfig('logging_heroku.conf')
 logger = logging.getLogger('main')
 gdlogger = logging.getLogger('game_thread_bot')
 sblogger = logging.getLogger('sidebarbot')
-nba_service = NbaService(gdlogger)
+gdstate = FileCache(os.path.join(STATE_DIRECTORY, 'game_thread_bot.json'))
+sbstate = FileCache(os.path.join(STATE_DIRECTORY, 'sidebarbot.json'))
+nba_cache_directory = os.path.join(STATE_DIRECTORY, 'nba_cache')
 
 class Config:
   """Container for reddit environment variables."""
@@ -70,8 +73,13 @@ def every_minute():
   logger.info(f'Using subreddit "{cfg.subreddit_name}" and user "{cfg.username}".')
   reddit = cfg.reddit()
 
-  sidebarbot.execute(sblogger, now, reddit, cfg.subreddit_name)
-  GameThreadBot(gdlogger, nba_service, now, reddit, cfg.subreddit_name, 0).run()
+  # A new service each run so both bots share responses without going stale.
+  nba_service = NbaService(logger, nba_cache_directory)
+  sidebarbot.execute(
+      sblogger, now, reddit, cfg.subreddit_name, nba_service, sbstate)
+  GameThreadBot(
+      gdlogger, nba_service, now, lambda: reddit, cfg.subreddit_name, 0,
+      gdstate).run()
   logger.info('Done.')
 
 sched.start()
\ No newline at end of file
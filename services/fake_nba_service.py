@@ -18,6 +18,9 @@ class FakeNbaService(NbaService):
   def conference_standings(self):
     return self._json('standings_conference.json')['league']['standard']
 
+  def standings_published(self):
+    return self._json('standings_conference.json')['_internal']['pubDateTime']
+
   def current_year(self):
     return '2020'
 
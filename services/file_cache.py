@@ -0,0 +1,65 @@
+"""
+A small key/value store backed by a JSON file. The bots run as short lived jobs
+so this is how they remember things from one run to the next.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class FileCache:
+
+  def __init__(self, path):
+    self.path = path
+    self._entries = None
+    # Callers may fetch (and cache) several things at once from threads.
+    self._lock = threading.Lock()
+
+  def get(self, key, max_age_seconds=None):
+    """
+    Returns the value stored for key or None if there isn't one.
+
+    Parameters
+    ----------
+    key: str
+    max_age_seconds: float
+      Optional. Values that were stored longer ago than this are ignored.
+    """
+    entry = self._load().get(key)
+    if entry is None:
+      return None
+    if (max_age_seconds is not None
+        and time.time() - entry['time'] > max_age_seconds):
+      return None
+    return entry['value']
+
+  def put(self, key, value):
+    """Stores a JSON serializable value and writes it to disk right away."""
+    with self._lock:
+      # Re-read the file in case another process wrote to it since we loaded
+      # it.
+      entries = self._read()
+      entries[key] = {'time': time.time(), 'value': value}
+      directory = os.path.dirname(self.path)
+      os.makedirs(directory, exist_ok=True)
+      # Write to a temp file first so readers never see a half written file.
+      fd, temp_path = tempfile.mkstemp(dir=directory)
+      with os.fdopen(fd, 'w') as f:
+        json.dump(entries, f)
+      os.replace(temp_path, self.path)
+      self._entries = entries
+
+  def _load(self):
+    if self._entries is None:
+      self._entries = self._read()
+    return self._entries
+
+  def _read(self):
+    try:
+      with open(self.path, 'r') as f:
+        return json.load(f)
+    except (OSError, ValueError):
+      return dict()
@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+from services.file_cache import FileCache
+from unittest.mock import patch
+
+import os.path
+import tempfile
+import unittest
+
+
+class FileCacheTest(unittest.TestCase):
+
+  def setUp(self):
+    self.temp_dir = tempfile.TemporaryDirectory()
+    self.path = os.path.join(self.temp_dir.name, 'state', 'cache.json')
+
+  def tearDown(self):
+    self.temp_dir.cleanup()
+
+  def test_get_missingKey_returnNone(self):
+    self.assertIsNone(FileCache(self.path).get('nope'))
+
+  def test_put_readByAnotherInstance(self):
+    FileCache(self.path).put('key', {'a': [1, 2]})
+    self.assertEqual(FileCache(self.path).get('key'), {'a': [1, 2]})
+
+  def test_put_keepsKeysWrittenByOthers(self):
+    cache1 = FileCache(self.path)
+    cache2 = FileCache(self.path)
+    cache1.get('key1')
+    cache2.put('key2', 'two')
+    cache1.put('key1', 'one')
+    self.assertEqual(FileCache(self.path).get('key2'), 'two')
+
+  def test_put_fromThreads_keepsAllKeys(self):
+    cache = FileCache(self.path)
+    with ThreadPoolExecutor(max_workers=5) as executor:
+      for i in range(20):
+        executor.submit(cache.put, f'key{i}', i)
+    reloaded = FileCache(self.path)
+    self.assertEqual([reloaded.get(f'key{i}') for i in range(20)],
+                     list(range(20)))
+
+  @patch('time.time')
+  def test_get_expired_returnNone(self, mock_time):
+    mock_time.return_value = 1000
+    cache = FileCache(self.path)
+    cache.put('key', 'value')
+    mock_time.return_value = 1061
+    self.assertEqual(cache.get('key', max_age_seconds=61), 'value')
+    self.assertIsNone(cache.get('key', max_age_seconds=60))
+
+
+if __name__ == '__main__':
+  unittest.main()
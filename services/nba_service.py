@@ -4,19 +4,96 @@ up NBA data and returns their responses. It encapsulates details around forming
 the correct request URLs and marshalling JSON responses into python objects.
 """
 
-import json
+from datetime import datetime
+from requests.adapters import HTTPAdapter
+from services.file_cache import FileCache
+from urllib3.util.retry import Retry
+
 import logging.config
+import orjson
+import os.path
+import re
 import requests
 
+# If NBA's servers are having problems, fall back to a previously downloaded
+# response as long as it expired no longer ago than this. Only responses with a
+# max age are used this way. The schedule and box scores have live game state
+# in them, so acting on an old copy could post the wrong thing.
+STALE_IF_ERROR_SECONDS = 24 * 60 * 60
+
+# How long a cached response can be used without asking NBA's servers whether it
+# changed. Schedules and box scores have live scores in them so they aren't
+# cached at all.
+TEAMS_MAX_AGE_SECONDS = 24 * 60 * 60
+PLAYERS_MAX_AGE_SECONDS = 24 * 60 * 60
+ROSTER_MAX_AGE_SECONDS = 60 * 60
+TODAY_MAX_AGE_SECONDS = 60 * 60
+STANDINGS_MAX_AGE_SECONDS = 15 * 60
+
+
+def _create_session():
+  """Returns a session that keeps connections to NBA's servers open between
+  requests and retries the ones that fail for reasons that usually go away."""
+  session = requests.Session()
+  # NBA's servers are much slower to respond to requests that don't look like
+  # they came from a browser.
+  session.headers.update({
+    'User-Agent': ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+                   'AppleWebKit/537.36 (KHTML, like Gecko) '
+                   'Chrome/87.0.4280.88 Safari/537.36'),
+    'Referer': 'https://www.nba.com/',
+    'Origin': 'https://www.nba.com',
+    'Accept-Encoding': 'gzip, deflate',
+  })
+  retries = Retry(
+      total=3,
+      backoff_factor=0.5,
+      status_forcelist=[429, 500, 502, 503, 504])
+  adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retries)
+  session.mount('http://', adapter)
+  session.mount('https://', adapter)
+  return session
+
+
+# Shared by every NbaService so they all reuse the same connections.
+_SESSION = _create_session()
+
+
+def parse_datetime(timestamp):
+  """
+  Parses a timestamp from the NBA Data API (i.e., "2020-12-30T00:00:00.000Z").
+
+  These are always ISO-8601 so the much faster standard library parser is tried
+  first. dateutil is only used if NBA ever sends something unexpected.
+  """
+  try:
+    return datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+  except ValueError:
+    # Imported here because it's rarely needed and slow to import.
+    import dateutil.parser
+    return dateutil.parser.parse(timestamp)
+
 
 class NbaService:
 
-  def __init__(self, logger=None):
+  def __init__(self, logger=None, cache_directory=None):
+    """
+    Parameters
+    ----------
+    logger: logging.Logger
+    cache_directory: str
+      Optional. Where to keep downloaded responses between runs. Each URL gets
+      its own file so a run only reads and writes the responses it uses.
+    """
     if logger is None:
       logging.config.fileConfig('logging.conf')
       self.logger = logging.getLogger(__name__)
     else:
       self.logger = logger
+    # Decoded JSON responses keyed by URL. An instance is meant to live for a
+    # single bot run, so identical lookups only hit the network once.
+    self._responses = dict()
+    self.cache_directory = cache_directory
 
   def boxscore(self, start_date_est, game_id):
     """
@@ -31,54 +108,125 @@ class NbaService:
       Another string provided by the schedule API for the game in question.
     """
     self.logger.info(f'Fetching boxscore for {start_date_est} and {game_id}.')
-    r = requests.get(
+    return self._get_json(
         f'http://data.nba.net/prod/v1/{start_date_est}/{game_id}_boxscore.json')
-    r.raise_for_status()
-    return json.loads(r.content.decode('utf-8'))
 
   def conference_standings(self):
     self.logger.info('Fetching conference standings.')
-    r = requests.get(
-        'http://data.nba.net/10s/prod/v1/current/standings_conference.json')
-    r.raise_for_status()
-    data = json.loads(r.content.decode('utf-8'))
-    return data['league']['standard']
+    return self._conference_standings_json()['league']['standard']
+
+  def standings_published(self):
+    """Returns when NBA last updated the conference standings (i.e.,
+    "2018-03-11 19:20:53.087"). This reuses the conference_standings response
+    if it was already fetched."""
+    return self._conference_standings_json()['_internal']['pubDateTime']
 
   def current_year(self):
     self.logger.info('Fetching current season schedule year.')
-    r = requests.get('http://data.nba.net/10s/prod/v1/today.json')
-    r.raise_for_status()
-    data = json.loads(r.content.decode('utf-8'))
+    data = self._get_json(
+        'http://data.nba.net/10s/prod/v1/today.json', TODAY_MAX_AGE_SECONDS)
     return data['seasonScheduleYear']
 
   def players(self, year):
     self.logger.info(f'Fetching all player metadata for {year}.')
-    r = requests.get(f'http://data.nba.net/prod/v1/{year}/players.json')
-    r.raise_for_status()
-    data = json.loads(r.content.decode('utf-8'))
+    data = self._get_json(
+        f'http://data.nba.net/prod/v1/{year}/players.json',
+        PLAYERS_MAX_AGE_SECONDS)
     return data['league']['standard']
 
   def roster(self, team, year):
     self.logger.info(f'Fetching {team} roster.')
-    r = requests.get(f'http://data.nba.net/prod/v1/{year}/teams/{team}/roster.json')
-    r.raise_for_status()
-    data = json.loads(r.content.decode('utf-8'))
+    data = self._get_json(
+        f'http://data.nba.net/prod/v1/{year}/teams/{team}/roster.json',
+        ROSTER_MAX_AGE_SECONDS)
     return set(
         map(lambda p: p['personId'], data['league']['standard']['players']))
 
   def schedule(self, team, year):
     self.logger.info(f'Fetching {team} schedule information.')
     base_url = f'http://data.nba.net/data/10s/prod/v1/{year}/teams/{team}'
-    r = requests.get(f'{base_url}/schedule.json')
-    r.raise_for_status()
-    return json.loads(r.content.decode('utf-8'))
+    return self._get_json(f'{base_url}/schedule.json')
 
   def teams(self, year):
     self.logger.info(f'Fetching {year} team-level metadata for all teams.')
-    r = requests.get(f'http://data.nba.net/10s/prod/v1/{year}/teams.json')
-    r.raise_for_status()
-    teams = json.loads(r.content.decode('utf-8'))
+    teams = self._get_json(
+        f'http://data.nba.net/10s/prod/v1/{year}/teams.json',
+        TEAMS_MAX_AGE_SECONDS)
     teams_map = dict()
     for team in teams['league']['standard']:
       teams_map[team['teamId']] = team
     return teams_map
+
+  def _conference_standings_json(self):
+    return self._get_json(
+        'http://data.nba.net/10s/prod/v1/current/standings_conference.json',
+        STANDINGS_MAX_AGE_SECONDS)
+
+  def _get_json(self, url, max_age_seconds=None):
+    """Requests a URL and decodes the JSON response. Responses are remembered
+    so asking for the same URL again does not make another network call.
+
+    If there's a cache, a cached response younger than max_age_seconds is used
+    without making a request at all."""
+    if url in self._responses:
+      self.logger.debug(f'Reusing response for {url}.')
+      return self._responses[url]
+    data = self._fetch_json(url, max_age_seconds)
+    self._responses[url] = data
+    return data
+
+  def _cache_for(self, url):
+    """Returns the FileCache that holds url's response."""
+    file_name = re.sub(r'[^A-Za-z0-9.]+', '_', url.split('://', 1)[-1])
+    return FileCache(os.path.join(self.cache_directory, file_name))
+
+  def _fetch_json(self, url, max_age_seconds=None):
+    """Downloads and decodes a JSON response.
+
+    Only responses with a max age are cached. Once one is older than that, this
+    sends the validators from the last response so the server can answer with
+    a short 304 (Not Modified) when nothing changed."""
+    if self.cache_directory is None or max_age_seconds is None:
+      r = _SESSION.get(url, headers=dict())
+      r.raise_for_status()
+      # orjson is a lot faster than json for big responses like the schedule
+      # and it reads the raw bytes directly.
+      return orjson.loads(r.content)
+
+    cache = self._cache_for(url)
+    fresh = cache.get(url, max_age_seconds)
+    if fresh is not None:
+      self.logger.debug(f'Using cached response for {url}.')
+      return fresh['data']
+
+    cached = cache.get(url)
+
+    headers = dict()
+    if cached is not None:
+      if cached['etag']:
+        headers['If-None-Match'] = cached['etag']
+      if cached['last_modified']:
+        headers['If-Modified-Since'] = cached['last_modified']
+
+    try:
+      r = _SESSION.get(url, headers=headers)
+      if r.status_code == 304 and cached is not None:
+        self.logger.debug(f'{url} has not changed.')
+        # Start the clock again so we don't ask again until it's stale.
+        cache.put(url, cached)
+        return cached['data']
+      r.raise_for_status()
+    except requests.RequestException:
+      stale = cache.get(url, max_age_seconds + STALE_IF_ERROR_SECONDS)
+      if stale is None:
+        raise
+      self.logger.warning(f'Failed to fetch {url}. Using an older response.')
+      return stale['data']
+
+    data = orjson.loads(r.content)
+    cache.put(url, {
+      'etag': r.headers.get('ETag'),
+      'last_modified': r.headers.get('Last-Modified'),
+      'data': data,
+    })
+    return data
@@ -1,17 +1,22 @@
-from services.nba_service import NbaService
+from constants import UTC
+from datetime import datetime
+from services.nba_service import NbaService, parse_datetime
 from unittest.mock import patch
 
 import logging.config
 import os.path
+import requests
+import tempfile
 import unittest
 
 
 class MockResponse:
 
-  def __init__(self, file_name, status_code):
+  def __init__(self, file_name, status_code, headers=None):
     with open(file_name, 'r') as f:
       self.content = f.read().encode('utf-8')
     self.status_code = status_code
+    self.headers = headers if headers is not None else dict()
 
   def raise_for_status(self):
     pass
@@ -30,15 +35,15 @@ class NbaServiceTest(unittest.TestCase):
     logging.basicConfig(level=logging.ERROR)
     self.nba_service = NbaService(logging.getLogger(__name__))
 
-  @patch('requests.get', side_effect=mocked_requests_get)
+  @patch('requests.Session.get', side_effect=mocked_requests_get)
   def test_boxscore(self, mock_get):
     boxscore = self.nba_service.boxscore('20201231', '0022000066')
     # Just verify a few properties instead of the entire large response.
     self.assertEqual(boxscore['basicGameData']['gameUrlCode'], '20201231/NYKTOR')
     mock_get.assert_called_once_with(
-        'http://data.nba.net/prod/v1/20201231/0022000066_boxscore.json')
+        'http://data.nba.net/prod/v1/20201231/0022000066_boxscore.json', headers={})
 
-  @patch('requests.get', side_effect=mocked_requests_get)
+  @patch('requests.Session.get', side_effect=mocked_requests_get)
   def test_conference_standings(self, mock_get):
     standings = self.nba_service.conference_standings()
     # Just verify a few properties instead of the entire large response.
@@ -46,15 +51,23 @@ class NbaServiceTest(unittest.TestCase):
     teamIds = list(map(lambda t: t['teamId'], standings['conference']['east']))
     self.assertEqual(teamIds[0:2], ['1610612761', '1610612738'])
     mock_get.assert_called_once_with(
-        'http://data.nba.net/10s/prod/v1/current/standings_conference.json')
+        'http://data.nba.net/10s/prod/v1/current/standings_conference.json', headers={})
 
-  @patch('requests.get', side_effect=mocked_requests_get)
+  @patch('requests.Session.get', side_effect=mocked_requests_get)
+  def test_standings_published(self, mock_get):
+    self.nba_service.conference_standings()
+    self.assertEqual(
+        self.nba_service.standings_published(), '2018-03-11 19:20:53.087')
+    mock_get.assert_called_once_with(
+        'http://data.nba.net/10s/prod/v1/current/standings_conference.json', headers={})
+
+  @patch('requests.Session.get', side_effect=mocked_requests_get)
   def test_current_year(self, mock_get):
     self.assertEqual(self.nba_service.current_year(), 2020)
     mock_get.assert_called_once_with(
-        'http://data.nba.net/10s/prod/v1/today.json')
+        'http://data.nba.net/10s/prod/v1/today.json', headers={})
 
-  @patch('requests.get', side_effect=mocked_requests_get)
+  @patch('requests.Session.get', side_effect=mocked_requests_get)
   def test_players(self, mock_get):
     response = self.nba_service.players('2020')
     # Just verify a few properties instead of the entire large response.
@@ -73,17 +86,17 @@ class NbaServiceTest(unittest.TestCase):
     ]
     self.assertEqual(actual_names, expected_names)
     mock_get.assert_called_once_with(
-        'http://data.nba.net/prod/v1/2020/players.json')
+        'http://data.nba.net/prod/v1/2020/players.json', headers={})
 
-  @patch('requests.get', side_effect=mocked_requests_get)
+  @patch('requests.Session.get', side_effect=mocked_requests_get)
   def test_roster(self, mock_get):
     response = self.nba_service.roster('knicks', '2020')
     expected = set(['1629628', '1629649', '203493', '202692'])
     self.assertEqual(response, expected)
     mock_get.assert_called_once_with(
-        'http://data.nba.net/prod/v1/2020/teams/knicks/roster.json')
+        'http://data.nba.net/prod/v1/2020/teams/knicks/roster.json', headers={})
 
-  @patch('requests.get', side_effect=mocked_requests_get)
+  @patch('requests.Session.get', side_effect=mocked_requests_get)
   def test_schedule(self, mock_get):
     response = self.nba_service.schedule('knicks', '2020')
     # Just verify a few properties instead of the entire large response.
@@ -91,9 +104,9 @@ class NbaServiceTest(unittest.TestCase):
     expected = ['0012000002', '0012000015', '0012000028']
     self.assertEqual(actual[0:3], expected)
     mock_get.assert_called_once_with(
-        'http://data.nba.net/data/10s/prod/v1/2020/teams/knicks/schedule.json')
+        'http://data.nba.net/data/10s/prod/v1/2020/teams/knicks/schedule.json', headers={})
 
-  @patch('requests.get', side_effect=mocked_requests_get)
+  @patch('requests.Session.get', side_effect=mocked_requests_get)
   def test_teams(self, mock_get):
     teams = self.nba_service.teams('2020')
     # Just spot check a few properties instead of the entire large response.
@@ -101,7 +114,162 @@ class NbaServiceTest(unittest.TestCase):
     self.assertEqual('Hawks', teams['1610612737']['nickname'])
     self.assertEqual('Boston Celtics', teams['1610612738']['fullName'])
     mock_get.assert_called_once_with(
-        'http://data.nba.net/10s/prod/v1/2020/teams.json')
+        'http://data.nba.net/10s/prod/v1/2020/teams.json', headers={})
+
+  @patch('requests.Session.get', side_effect=mocked_requests_get)
+  def test_teams_calledTwice_fetchesOnce(self, mock_get):
+    self.nba_service.teams('2020')
+    teams = self.nba_service.teams('2020')
+    self.assertEqual('Atlanta Hawks', teams['1610612737']['fullName'])
+    mock_get.assert_called_once_with(
+        'http://data.nba.net/10s/prod/v1/2020/teams.json', headers={})
+
+
+class NbaServiceCacheTest(unittest.TestCase):
+
+  URL = 'http://data.nba.net/10s/prod/v1/2020/teams.json'
+  SCHEDULE_URL = (
+      'http://data.nba.net/data/10s/prod/v1/2020/teams/knicks/schedule.json')
+
+  def setUp(self):
+    logging.basicConfig(level=logging.ERROR)
+    self.temp_dir = tempfile.TemporaryDirectory()
+
+  def tearDown(self):
+    self.temp_dir.cleanup()
+
+  def service(self):
+    return NbaService(logging.getLogger(__name__), self.temp_dir.name)
+
+  @patch('time.time')
+  @patch('requests.Session.get')
+  def test_teams_expiredAndNotModified_usesCachedResponse(
+      self, mock_get, mock_time):
+    mock_time.return_value = 1000
+    mock_get.return_value = MockResponse(
+        'services/testdata/teams.json', 200, {'ETag': '"v1"'})
+    self.service().teams('2020')
+
+    # Once it expires, a new run revalidates with the ETag from the first
+    # response.
+    mock_time.return_value = 1000 + 25 * 60 * 60
+    mock_get.return_value = MockResponse('services/testdata/teams.json', 304)
+    teams = self.service().teams('2020')
+
+    self.assertEqual('Atlanta Hawks', teams['1610612737']['fullName'])
+    mock_get.assert_called_with(self.URL, headers={'If-None-Match': '"v1"'})
+
+    # The 304 starts the clock again.
+    mock_time.return_value = 1000 + 48 * 60 * 60
+    self.service().teams('2020')
+    self.assertEqual(mock_get.call_count, 2)
+
+  @patch('requests.Session.get')
+  def test_schedule_hasValidators_doesNotCache(self, mock_get):
+    mock_get.return_value = MockResponse(
+        'services/testdata/schedule.json', 200, {'ETag': '"v1"'})
+    self.service().schedule('knicks', '2020')
+    self.service().schedule('knicks', '2020')
+    mock_get.assert_called_with(self.SCHEDULE_URL, headers={})
+    self.assertEqual(mock_get.call_count, 2)
+    self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+  @patch('requests.Session.get', side_effect=mocked_requests_get)
+  def test_cache_oneFilePerUrl(self, mock_get):
+    service = self.service()
+    service.teams('2020')
+    service.current_year()
+    self.assertEqual(
+        sorted(os.listdir(self.temp_dir.name)),
+        ['data.nba.net_10s_prod_v1_2020_teams.json',
+         'data.nba.net_10s_prod_v1_today.json'])
+
+  @patch('time.time')
+  @patch('requests.Session.get')
+  def test_teams_fresh_doesNotMakeRequest(self, mock_get, mock_time):
+    mock_time.return_value = 1000
+    mock_get.return_value = MockResponse('services/testdata/teams.json', 200)
+    self.service().teams('2020')
+
+    mock_time.return_value = 1000 + 23 * 60 * 60
+    teams = self.service().teams('2020')
+
+    self.assertEqual('Atlanta Hawks', teams['1610612737']['fullName'])
+    mock_get.assert_called_once_with(self.URL, headers={})
+
+  @patch('time.time')
+  @patch('requests.Session.get')
+  def test_teams_expired_makesRequest(self, mock_get, mock_time):
+    mock_time.return_value = 1000
+    mock_get.return_value = MockResponse('services/testdata/teams.json', 200)
+    self.service().teams('2020')
+
+    mock_time.return_value = 1000 + 25 * 60 * 60
+    self.service().teams('2020')
+
+    self.assertEqual(mock_get.call_count, 2)
+
+  @patch('requests.Session.get')
+  def test_schedule_requestFails_raises(self, mock_get):
+    mock_get.return_value = MockResponse(
+        'services/testdata/schedule.json', 200,
+        {'Last-Modified': 'Wed, 30 Dec 2020 00:00:00 GMT'})
+    self.service().schedule('knicks', '2020')
+
+    # An old schedule could have old scores in it so it's never used.
+    mock_get.side_effect = requests.ConnectionError()
+    with self.assertRaises(requests.ConnectionError):
+      self.service().schedule('knicks', '2020')
+
+  @patch('time.time')
+  @patch('requests.Session.get')
+  def test_standings_requestFails_usesExpiredResponse(
+      self, mock_get, mock_time):
+    mock_time.return_value = 1000
+    mock_get.return_value = MockResponse(
+        'services/testdata/standings_conference.json', 200)
+    self.service().conference_standings()
+
+    # The cached standings expired 15 minutes ago.
+    mock_time.return_value = 1000 + 30 * 60
+    mock_get.side_effect = requests.ConnectionError()
+    standings = self.service().conference_standings()
+
+    self.assertEqual(2017, standings['seasonYear'])
+    self.assertEqual(mock_get.call_count, 2)
+
+  @patch('time.time')
+  @patch('requests.Session.get')
+  def test_standings_requestFailsAfterStaleWindow_raises(
+      self, mock_get, mock_time):
+    mock_time.return_value = 1000
+    mock_get.return_value = MockResponse(
+        'services/testdata/standings_conference.json', 200)
+    self.service().conference_standings()
+
+    mock_time.return_value = 1000 + 15 * 60 + 25 * 60 * 60
+    mock_get.side_effect = requests.ConnectionError()
+    with self.assertRaises(requests.ConnectionError):
+      self.service().conference_standings()
+
+  @patch('requests.Session.get')
+  def test_teams_requestFailsWithoutCache_raises(self, mock_get):
+    mock_get.side_effect = requests.ConnectionError()
+    with self.assertRaises(requests.ConnectionError):
+      self.service().teams('2020')
+
+
+class ParseDatetimeTest(unittest.TestCase):
+
+  def test_parse_datetime_isoFormat(self):
+    self.assertEqual(
+        parse_datetime('2020-12-30T00:00:00.000Z'),
+        datetime(2020, 12, 30, 0, 0, 0, 0, UTC))
+
+  def test_parse_datetime_otherFormat_fallsBack(self):
+    self.assertEqual(
+        parse_datetime('Wed, 30 Dec 2020 00:00:00 GMT'),
+        datetime(2020, 12, 30, 0, 0, 0, 0, UTC))
 
 
 if __name__ == '__main__':
@@ -1,112 +1,154 @@
-from constants import EASTERN_TIMEZONE, TEAM_SUB_MAP, UTC
+from concurrent.futures import ThreadPoolExecutor
+from constants import EASTERN_TIMEZONE, STATE_DIRECTORY, TEAM_SUB_MAP, UTC
 from datetime import datetime, timedelta
-from optparse import OptionParser
-from services.nba_service import NbaService
-
-import copy
-import dateutil.parser
+from operator import itemgetter
+from services.file_cache import FileCache
+from services.nba_service import NbaService, parse_datetime
+
+import argparse
+import hashlib
+import heapq
+import itertools
 import logging.config
+import os.path
 import praw
-import sys
 import traceback
 
-def build_roster(nba_service, year):
-  players = nba_service.players(year)
-  roster = nba_service.roster('knicks', year)
+# Skip looking at the sidebar if what we'd put in it hasn't changed since the
+# last run, but still check this often in case someone edited it by hand.
+SIDEBAR_RECHECK_MINUTES = 60
+
+# Rendered standings tables, keyed by season and when NBA published the
+# standings. The scheduler runs the bot every minute in the same process but the
+# standings only change a few times a day.
+_rendered_standings = dict()
+
+MONTH_ABBREVIATIONS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug',
+                       'Sep', 'Oct', 'Nov', 'Dec')
+
+def build_roster(players, roster):
   team_players = filter(lambda player: player['personId'] in roster, players)
 
-  rows = []
+  players_info = []
   for player in team_players:
     name = f'{player["firstName"]} {player["lastName"]}'
     jersey = player['jersey'] if player['jersey'] else '-'
     position = player['pos'].replace('-', '/') if player['pos'] else ''
-    rows.append(f'{jersey}|{name}|{position}')
+    players_info.append((jersey, name, position))
 
   # Sort players by first name.
-  rows.sort(key = lambda r: r.split('|')[1])
+  players_info.sort(key=itemgetter(1))
 
-  rows.insert(0, ':--:|:--|:--:')
-  rows.insert(0, 'No.|Name|Position')
+  rows = ['No.|Name|Position', ':--:|:--|:--:']
+  rows.extend(f'{jersey}|{name}|{position}'
+              for jersey, name, position in players_info)
   return '\n'.join(rows)
 
 
-def build_schedule(logger, nba_service, now, teams, year):
+def build_schedule(logger, schedule, now, team_sub_by_id):
   today = now.astimezone(EASTERN_TIMEZONE).date()
-  schedule = nba_service.schedule('knicks', year)
 
   logger.info('Building schedule text.')
   # FYI: We want to show to a show a total of 12 games: 
   #    most recent + 4 prior + 7 next.
   # Get the array index of the last game played.
   last_played_idx = schedule['league']['lastStandardGamePlayedIndex']
+  games = schedule['league']['standard']
 
   # Get the next 7 games.
-  end_idx = min(last_played_idx + 7, len(schedule['league']['standard']))
+  end_idx = min(last_played_idx + 7, len(games))
 
   # Show the previous 4 games or more if we're at the end of the season.
   start_idx = max(0, last_played_idx - (4 + (7 - (end_idx - last_played_idx - 1))))
 
+  label_by_date = {
+    today: 'Today',
+    today - timedelta(days=1): 'Yesterday',
+    today + timedelta(days=1): 'Tomorrow',
+  }
+
   rows = ['Date|Team|Loc|Time/Outcome', ':--:|:--:|:--:|:--:']
-  for i in range(start_idx, end_idx):
-    game = schedule['league']['standard'][i]
+  for game in games[start_idx:end_idx]:
     is_home_team = game['isHomeTeam']
     knicks_score = game['hTeam' if is_home_team else 'vTeam']
     opp_score = game['vTeam' if is_home_team else 'hTeam']
-    opp_team_name = teams[opp_score['teamId']]['nickname']
-    opp_team_sub = TEAM_SUB_MAP[opp_team_name]
-
-    gametime = dateutil.parser \
-        .parse(game['startTimeUTC']) \
-        .astimezone(EASTERN_TIMEZONE)
-    
-    if gametime.date() == today:
-      date = 'Today'
-    elif gametime.date() == today - timedelta(days=1):
-      date = 'Yesterday'
-    elif gametime.date() == today + timedelta(days=1):
-      date = 'Tomorrow'
-    else:
-      date = gametime.strftime('%b %d')
-
-    time = gametime.strftime('%I:%M %p').lstrip('0')
-    time_or_score = (time if knicks_score['score'] == ''
-        else winloss(knicks_score, opp_score))
+    opp_team_sub = team_sub_by_id[opp_score['teamId']]
+
+    gametime = parse_datetime(game['startTimeUTC']).astimezone(EASTERN_TIMEZONE)
+    date = label_by_date.get(gametime.date()) or format_date(gametime)
+
+    # Only games that haven't been played yet show a start time.
+    time_or_score = (format_time(gametime)
+        if knicks_score['score'] == '' else winloss(knicks_score, opp_score))
 
     if game['gameUrlCode'] == '20210220/SASNYK':
       time_or_score = 'POSTPONED'
 
-    row = ('%s|[](/r/%s)|%s|%s' %
-        (date, opp_team_sub, 
-            'Home' if is_home_team else 'Away', time_or_score))
-    rows.append(row)
+    location = 'Home' if is_home_team else 'Away'
+    rows.append(f'{date}|[](/r/{opp_team_sub})|{location}|{time_or_score}')
   return '\n'.join(rows)
 
 
-def build_standings(standings, teams):
+def format_date(time):
+  """Same as time.strftime('%b %d') (i.e., "Dec 09") without the locale lookup
+  or having to parse a format string."""
+  return f'{MONTH_ABBREVIATIONS[time.month - 1]} {time.day:02d}'
+
+
+def format_time(time):
+  """Same as time.strftime('%I:%M %p').lstrip('0') (i.e., "7:30 PM") without
+  having to parse a format string."""
+  am_pm = 'PM' if time.hour >= 12 else 'AM'
+  return f'{time.hour % 12 or 12}:{time.minute:02d} {am_pm}'
+
+
+def build_standings(standings, nickname_by_id, team_sub_by_id):
   rows = [' | | |Record|GB', ':--:|:--:|:--|:--:|:--:']
   for i, d in enumerate(standings):
-    team = teams[d['teamId']]['nickname']
-    teamsub = TEAM_SUB_MAP[team]
+    team = nickname_by_id[d['teamId']]
+    teamsub = team_sub_by_id[d['teamId']]
     wins = d['win']
     loses = d['loss']
     games_behind = d['gamesBehind']
     games_behind = '-' if games_behind == '0' else games_behind
-    row = ('%s|[](/r/%s)|%s|%s-%s|%s' %
-           (i + 1, teamsub, team, wins, loses, games_behind))
-    rows.append(row)
+    rows.append(
+        f'{i + 1}|[](/r/{teamsub})|{team}|{wins}-{loses}|{games_behind}')
   return '\n'.join(rows)
 
 
-def build_tank_standings(standings, teams):
-  s2 = copy.deepcopy(standings)
-  rows = s2['conference']['east'] + s2['conference']['west']
-  rows = sorted(rows, key=lambda team: float(team['lossPct']), reverse=True)
-  worst_wins = int(rows[0]['win'])
-  worst_loss = int(rows[0]['loss'])
-  for row in rows:
-     gb = (abs(worst_wins - int(row['win'])) + abs(worst_loss - int(row['loss']))) / 2
-     row['gamesBehind'] = ('%.1f' % gb).replace('.0', '')
-  return build_standings(rows[:10], teams)
+def build_tank_standings(standings, nickname_by_id, team_sub_by_id):
+  conferences = standings['conference']
+  worst_teams = heapq.nlargest(
+      10,
+      itertools.chain(conferences['east'], conferences['west']),
+      key=lambda team: float(team['lossPct']))
+  worst_wins = int(worst_teams[0]['win'])
+  worst_loss = int(worst_teams[0]['loss'])
+  # The same standings are used for the conference tables, so copy the rows
+  # instead of changing their gamesBehind in place.
+  rows = []
+  for team in worst_teams:
+    wins = int(team['win'])
+    losses = int(team['loss'])
+    gb = (abs(worst_wins - wins) + abs(worst_loss - losses)) / 2
+    rows.append(dict(team, gamesBehind=f'{gb:.1f}'.replace('.0', '')))
+  return build_standings(rows, nickname_by_id, team_sub_by_id)
+
+
+def build_all_standings(
+    standings, published, year, nickname_by_id, team_sub_by_id):
+  """Returns the tank, east and west standings tables. These are reused from
+  an earlier call if the standings haven't been updated since then."""
+  key = (year, published)
+  if key not in _rendered_standings:
+    conferences = standings['conference']
+    # Only the latest standings will ever be asked for again.
+    _rendered_standings.clear()
+    _rendered_standings[key] = (
+        build_tank_standings(standings, nickname_by_id, team_sub_by_id),
+        build_standings(conferences['east'], nickname_by_id, team_sub_by_id),
+        build_standings(conferences['west'], nickname_by_id, team_sub_by_id))
+  return _rendered_standings[key]
 
 
 def update_reddit_descr(descr, text, marker):
@@ -117,17 +159,18 @@ def update_reddit_descr(descr, text, marker):
   if start == -1 or end == -1:
     return descr
   new_text = f'{start_marker}\n\n{text}\n\n{end_marker}'
-  return descr.replace(descr[start:end + len(end_marker)], new_text)
+  return descr[:start] + new_text + descr[end + len(end_marker):]
 
 
 def winloss(knicks_score, opp_score):
   kscore = int(knicks_score['score'])
   oscore = int(opp_score['score'])
-  return ('W %s-%s' % (kscore, oscore) 
-      if kscore > oscore else 'L %s-%s' % (oscore, kscore))
+  return (f'W {kscore}-{oscore}'
+      if kscore > oscore else f'L {oscore}-{kscore}')
 
 
-def execute(logger, now, reddit, subreddit_name):
+def execute(
+    logger, now, reddit, subreddit_name, nba_service=None, state=None):
   """
     The main starting point (after command line args are parsed) that initiates
     all of the work this bot will do. It intereacts with reddit and the NBA Data
@@ -144,23 +187,65 @@ def execute(logger, now, reddit, subreddit_name):
     subreddit_name : string
       The name of the subreddit to modify. The bot must have permissions to edit
       in this sub.
+    nba_service : NbaService
+      Optional. Lets callers share one service (and its fetched responses) with
+      other bots. A new one is created if not provided.
+    state : FileCache
+      Optional. Where to remember what was last put in the sidebar so unchanged
+      runs don't have to talk to reddit at all.
   """
-  nba_service = NbaService(logger)
+  if nba_service is None:
+    nba_service = NbaService(logger)
 
   current_year = nba_service.current_year()
-  roster = build_roster(nba_service, current_year)
-  teams = nba_service.teams(current_year)
-  schedule = build_schedule(logger, nba_service, now, teams, current_year)
 
-  logger.info('Building standings text.')
-  nba_standings = nba_service.conference_standings()
-  tank_standings = build_tank_standings(nba_standings, teams)
-  east_standings = build_standings(nba_standings['conference']['east'], teams)
-  west_standings = build_standings(nba_standings['conference']['west'], teams)
+  # None of these depend on each other so fetch them all at the same time.
+  with ThreadPoolExecutor(max_workers=5) as executor:
+    players_future = executor.submit(nba_service.players, current_year)
+    roster_future = executor.submit(
+        nba_service.roster, 'knicks', current_year)
+    teams_future = executor.submit(nba_service.teams, current_year)
+    schedule_future = executor.submit(
+        nba_service.schedule, 'knicks', current_year)
+    standings_future = executor.submit(nba_service.conference_standings)
+    players = players_future.result()
+    nba_roster = roster_future.result()
+    teams = teams_future.result()
+    nba_schedule = schedule_future.result()
+    nba_standings = standings_future.result()
+
+  # teams also has all-star and historic teams that don't have a subreddit.
+  nickname_by_id = {
+      team_id: team['nickname'] for team_id, team in teams.items()
+      if team['isNBAFranchise']}
+  team_sub_by_id = {
+      team_id: TEAM_SUB_MAP[nickname]
+      for team_id, nickname in nickname_by_id.items()}
+
+  roster = build_roster(players, nba_roster)
+  schedule = build_schedule(logger, nba_schedule, now, team_sub_by_id)
 
-  logger.info('Querying reddit settings.')
+  logger.info('Building standings text.')
+  tank_standings, east_standings, west_standings = build_all_standings(
+      nba_standings,
+      nba_service.standings_published(),
+      current_year,
+      nickname_by_id,
+      team_sub_by_id)
+
+  sidebar_hash = hashlib.sha1('\n'.join(
+      (schedule, tank_standings, east_standings, west_standings, roster)
+      ).encode('utf-8')).hexdigest()
+  if state is not None and sidebar_hash == state.get(
+      'sidebar_hash', max_age_seconds=SIDEBAR_RECHECK_MINUTES * 60):
+    logger.info('No changes since the last run.')
+    return
+
+  # The sidebar text is part of the subreddit's public about page, which is a
+  # lot less to download than all of its moderator settings.
+  logger.info('Querying subreddit description.')
   subreddit = reddit.subreddit(subreddit_name)
-  descr = subreddit.mod.settings()['description']
+  descr = subreddit.description
   updated_descr = update_reddit_descr(descr, schedule, 'Schedule')
   updated_descr = update_reddit_descr(updated_descr, tank_standings, 'TankStandings')
   updated_descr = update_reddit_descr(updated_descr, east_standings, 'EastStandings')
@@ -172,35 +257,40 @@ def execute(logger, now, reddit, subreddit_name):
     subreddit.wiki['config/sidebar'].edit(updated_descr)
   else:
     logger.info('No changes.')
+  if state is not None:
+    state.put('sidebar_hash', sidebar_hash)
 
   logger.info('All done.')
 
 
 if __name__ == "__main__":
-  parser = OptionParser()
-  parser.add_option(
-      "-u",
-      "--user",
-      dest="username",
-      help="Reddit account for the bot to run as.",
-      metavar='[username]')
-  (options, args) = parser.parse_args()
+  parser = argparse.ArgumentParser()
+  parser.add_argument(
+      'subreddit', help='Name of the subreddit to manage, i.e. NYKnicks.')
+  parser.add_argument(
+      '-u',
+      '--user',
+      dest='username',
+      default='nyknicks-automod',
+      help='Reddit account for the bot to run as.',
+      metavar='username')
+  args = parser.parse_args()
 
   logging.config.fileConfig('logging.conf')
   logger = logging.getLogger('sidebarbot')
 
-  if len(args) != 1:
-    logger.error(f'Invalid command line arguments: {args}')
-    raise SystemExit(f'Usage: {sys.argv[0]} subreddit')
-
-  subreddit_name = args[0]
-  username = options.username if options.username else 'nyknicks-automod'
+  subreddit_name = args.subreddit
+  username = args.username
   logger.info(f'Using subreddit "{subreddit_name}" and user "{username}".')
 
   logger.info('Logging in to reddit.')
   reddit = praw.Reddit(username)
 
   try:
-    execute(logger, datetime.now(UTC), reddit, subreddit_name)
+    nba_service = NbaService(
+        logger, os.path.join(STATE_DIRECTORY, 'nba_cache'))
+    state = FileCache(os.path.join(STATE_DIRECTORY, 'sidebarbot.json'))
+    execute(
+        logger, datetime.now(UTC), reddit, subreddit_name, nba_service, state)
   except:
     logger.error(traceback.format_exc())
@@ -5,10 +5,14 @@ calls to the Reddit and NBA Data APIs.
 
 from datetime import datetime
 from services import nba_service_test
+from services.fake_nba_service import FakeNbaService
+from services.file_cache import FileCache
 from unittest.mock import MagicMock, patch
 
 import logging.config
+import os.path
 import sidebarbot
+import tempfile
 import unittest
 
 INITIAL_DESCR = """
@@ -149,15 +153,15 @@ class SidebarBotTest(unittest.TestCase):
   def setUp(self):
     logging.basicConfig(level=logging.ERROR)
     self.logger = logging.getLogger(__name__)
+    sidebarbot._rendered_standings.clear()
 
   @patch('praw.Reddit')
-  @patch('requests.get', side_effect=nba_service_test.mocked_requests_get)
+  @patch('requests.Session.get', side_effect=nba_service_test.mocked_requests_get)
   def test_execute_newChanges_updatesDescription(self, mock_get, mock_praw):
     # Expect it to lookup the initial description from the reddit API.
-    mock_mod = MagicMock()
-    mock_mod.settings.return_value = {'description': INITIAL_DESCR}
     mock_wiki = MagicMock(['edit'])
-    mock_subreddit = MagicMock(mod=mock_mod, wiki={'config/sidebar': mock_wiki})
+    mock_subreddit = MagicMock(
+        description=INITIAL_DESCR, wiki={'config/sidebar': mock_wiki})
     mock_reddit = MagicMock(['subreddit'])
     mock_reddit.subreddit.return_value = mock_subreddit
     mock_praw.return_value = mock_reddit
@@ -171,12 +175,12 @@ class SidebarBotTest(unittest.TestCase):
     mock_wiki.edit.assert_called_with(EXPECTED_UPDATED_DESCR)
 
   @patch('praw.Reddit')
-  @patch('requests.get', side_effect=nba_service_test.mocked_requests_get)
+  @patch('requests.Session.get', side_effect=nba_service_test.mocked_requests_get)
   def test_execute_noChanges_doesNotUpdateDescrip(self, mock_get, mock_praw):
     # Expect it to lookup the initial description from the reddit API.
-    mock_mod = MagicMock()
-    mock_mod.settings.return_value = {'description': EXPECTED_UPDATED_DESCR}
-    mock_subreddit = MagicMock(mod=mock_mod)
+    mock_wiki = MagicMock(['edit'])
+    mock_subreddit = MagicMock(
+        description=EXPECTED_UPDATED_DESCR, wiki={'config/sidebar': mock_wiki})
     mock_reddit = MagicMock(['subreddit'])
     mock_reddit.subreddit.return_value = mock_subreddit
     mock_praw.return_value = mock_reddit
@@ -187,16 +191,40 @@ class SidebarBotTest(unittest.TestCase):
 
     # Verify.
     mock_reddit.subreddit.assert_called_with('subredditName')
-    mock_mod.update.assert_not_called()
+    mock_wiki.edit.assert_not_called()
+
+  @patch('praw.Reddit')
+  @patch('requests.Session.get', side_effect=nba_service_test.mocked_requests_get)
+  def test_execute_sameTextAsLastRun_doesNotQueryReddit(
+      self, mock_get, mock_praw):
+    mock_wiki = MagicMock(['edit'])
+    mock_subreddit = MagicMock(
+        description=INITIAL_DESCR, wiki={'config/sidebar': mock_wiki})
+    mock_reddit = MagicMock(['subreddit'])
+    mock_reddit.subreddit.return_value = mock_subreddit
+    mock_praw.return_value = mock_reddit
+    now = datetime(2020, 12, 29, 17, 12, 52, 305157, sidebarbot.UTC)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+      state = FileCache(os.path.join(temp_dir, 'state.json'))
+
+      # Execute twice.
+      sidebarbot.execute(
+          self.logger, now, mock_reddit, 'subredditName', state=state)
+      sidebarbot.execute(
+          self.logger, now, mock_reddit, 'subredditName', state=state)
+
+      # Verify.
+      mock_reddit.subreddit.assert_called_once()
+      mock_wiki.edit.assert_called_once_with(EXPECTED_UPDATED_DESCR)
 
   @patch('praw.Reddit')
-  @patch('requests.get', side_effect=nba_service_test.mocked_requests_get)
+  @patch('requests.Session.get', side_effect=nba_service_test.mocked_requests_get)
   def test_execute_tankChanges_updatesDescription(self, mock_get, mock_praw):
     # Expect it to lookup the initial description from the reddit API.
-    mock_mod = MagicMock()
-    mock_mod.settings.return_value = {'description': INITIAL_TANK_STANDINGS_DESCR}
     mock_wiki = MagicMock(['edit'])
-    mock_subreddit = MagicMock(mod=mock_mod, wiki={'config/sidebar': mock_wiki})
+    mock_subreddit = MagicMock(
+        description=INITIAL_TANK_STANDINGS_DESCR, wiki={'config/sidebar': mock_wiki})
     mock_reddit = MagicMock(['subreddit'])
     mock_reddit.subreddit.return_value = mock_subreddit
     mock_praw.return_value = mock_reddit
@@ -225,13 +253,12 @@ class SidebarBotTest(unittest.TestCase):
 [](#EndTankStandings)""")
 
   @patch('praw.Reddit')
-  @patch('requests.get', side_effect=nba_service_test.mocked_requests_get)
+  @patch('requests.Session.get', side_effect=nba_service_test.mocked_requests_get)
   def test_execute_scheduleWithYesterdayTomorrow(self, mock_get, mock_praw):
     # Expect it to lookup the initial description from the reddit API.
-    mock_mod = MagicMock()
-    mock_mod.settings.return_value = {'description': INITIAL_SCHEDULE_DESCR}
     mock_wiki = MagicMock(['edit'])
-    mock_subreddit = MagicMock(mod=mock_mod, wiki={'config/sidebar': mock_wiki})
+    mock_subreddit = MagicMock(
+        description=INITIAL_SCHEDULE_DESCR, wiki={'config/sidebar': mock_wiki})
     mock_reddit = MagicMock(['subreddit'])
     mock_reddit.subreddit.return_value = mock_subreddit
     mock_praw.return_value = mock_reddit
@@ -260,6 +287,46 @@ Jan 08|[](/r/thunder)|Home|7:30 PM
 
 [](#EndSchedule)""")
 
+  def test_build_all_standings_samePubDate_reusesTables(self):
+    standings = FakeNbaService().conference_standings()
+
+    with patch('sidebarbot.build_standings', return_value='table') as mock_build:
+      first = sidebarbot.build_all_standings(
+          standings, '2018-03-11', '2017', dict(), dict())
+      second = sidebarbot.build_all_standings(
+          standings, '2018-03-11', '2017', dict(), dict())
+      self.assertEqual(mock_build.call_count, 3)
+
+      sidebarbot.build_all_standings(
+          standings, '2018-03-12', '2017', dict(), dict())
+      self.assertEqual(mock_build.call_count, 6)
+
+    self.assertEqual(first, ('table', 'table', 'table'))
+    self.assertIs(first, second)
+
+  def test_format_date(self):
+    for month in range(1, 13):
+      time = datetime(2020, month, 9, 19, 0, 0, 0, sidebarbot.UTC)
+      self.assertEqual(sidebarbot.format_date(time), time.strftime('%b %d'))
+
+  def test_format_time(self):
+    for hour in range(24):
+      time = datetime(2020, 12, 27, hour, 5, 0, 0, sidebarbot.UTC)
+      self.assertEqual(
+          sidebarbot.format_time(time), time.strftime('%I:%M %p').lstrip('0'))
+
+  def test_update_reddit_descr_onlyReplacesBetweenMarkers(self):
+    # The text between the markers also shows up outside of them.
+    descr = 'old\n[](#StartRoster)old[](#EndRoster)\nold'
+    self.assertEqual(
+        sidebarbot.update_reddit_descr(descr, 'new', 'Roster'),
+        'old\n[](#StartRoster)\n\nnew\n\n[](#EndRoster)\nold')
+
+  def test_update_reddit_descr_missingMarker_returnsDescr(self):
+    descr = '[](#StartRoster)old'
+    self.assertEqual(
+        sidebarbot.update_reddit_descr(descr, 'new', 'Roster'), descr)
+
 
 if __name__ == '__main__':
   unittest.main()